@@ -22,7 +22,7 @@ __author__ = 'Dallas R. Trinkle'
 
 import numpy as np
 from scipy.linalg import pinv2, solve
-import copy, collections, itertools, warnings, yaml
+import collections, itertools, warnings, yaml
 from functools import reduce
 from onsager import GFcalc
 from onsager import crystal
@@ -719,14 +719,16 @@ class VacancyMediated(object):
         self.threshold = self.crys.threshold
         self.dim = crys.dim
         self.chem = chem
-        self.sitelist = copy.deepcopy(sitelist)
-        self.jumpnetwork = copy.deepcopy(jumpnetwork)
+        # sitelist is a list of lists of ints, and jumpnetwork a list of lists of ((i, j), dx):
+        # only the lists and the dx arrays need copying
+        self.sitelist = [list(w) for w in sitelist]
+        self.jumpnetwork = [[(ij, dx.copy()) for ij, dx in jlist] for jlist in jumpnetwork]
         self.N = sum(len(w) for w in sitelist)
         self.invmap = np.zeros(self.N, dtype=int)
         for ind, w in enumerate(sitelist):
             for i in w:
                 self.invmap[i] = ind
-        self.om0_jn = copy.deepcopy(jumpnetwork)
+        self.om0_jn = [[(ij, dx.copy()) for ij, dx in jlist] for jlist in jumpnetwork]
         self.GFcalc = self.GFcalculator(NGFmax)
         # do some initial setup:
         # self.thermo = stars.StarSet(self.jumpnetwork, self.crys, self.chem, Nthermo)
@@ -776,20 +778,24 @@ class VacancyMediated(object):
         # outerkin is the list of stars that are in kinetic, but not in thermo
         # vstar2kin maps each vector star back to the corresponding star index
         # kin2vstar provides a list of vector stars indices corresponding to the same star index
+        # (all done with lookup tables: invmap for Wyckoff positions, state arrays for the stars)
+        kinrep = [s[0] for s in self.kinetic.stars]  # representative state for each kinetic star
         self.thermo2kin = [self.kinetic.starindex(self.thermo.states[s[0]]) for s in self.thermo.stars]
-        self.kin2vacancy = [self.invmap[self.kinetic.states[s[0]].j] for s in self.kinetic.stars]
-        self.outerkin = [s for s in range(self.kinetic.Nstars)
-                         if self.thermo.stateindex(self.kinetic.states[self.kinetic.stars[s][0]]) is None]
-        self.vstar2kin = [self.kinetic.index[Rs[0]] for Rs in self.vkinetic.vecpos]
-        self.kin2vstar = [[j for j in range(self.vkinetic.Nvstars) if self.vstar2kin[j] == i]
-                          for i in range(self.kinetic.Nstars)]
+        self.kin2vacancy = self.invmap[self.kinetic.states_ij[kinrep, 1]].tolist()
+        self.outerkin = np.flatnonzero(self.thermo.stateindices(self.kinetic.states_ij[kinrep],
+                                                                self.kinetic.states_R[kinrep]) < 0).tolist()
+        self.vstar2kin = self.kinetic.index[[Rs[0] for Rs in self.vkinetic.vecpos]].tolist()
+        self.kin2vstar = [[] for i in range(self.kinetic.Nstars)]
+        for j, i in enumerate(self.vstar2kin):
+            self.kin2vstar[i].append(j)
         # jumpnetwork, jumptype (omega0), star-pair for jump
         self.om1_jn, self.om1_jt, self.om1_SP = self.kinetic.jumpnetwork_omega1()
         self.om2_jn, self.om2_jt, self.om2_SP = self.kinetic.jumpnetwork_omega2()
         # Prune the om1 list: remove entries that have jumps between stars in outerkin:
         # work in reverse order so that popping is safe (and most of the offending entries are at the end
+        outerkinset = set(self.outerkin)
         for i, SP in zip(reversed(range(len(self.om1_SP))), reversed(self.om1_SP)):
-            if SP[0] in self.outerkin and SP[1] in self.outerkin:
+            if SP[0] in outerkinset and SP[1] in outerkinset:
                 self.om1_jn.pop(i), self.om1_jt.pop(i), self.om1_SP.pop(i)
         # empty dictionaries to store GF values
         self.clearcache()
@@ -815,8 +821,8 @@ class VacancyMediated(object):
         # more indexing helpers:
         # kineticsvWyckoff: Wyckoff position of solute and vacancy for kinetic stars
         # omega0vacancyWyckoff: Wyckoff positions of initial and final position in omega0 jumps
-        self.kineticsvWyckoff = [(self.invmap[PS.i], self.invmap[PS.j]) for PS in
-                                 [self.kinetic.states[si[0]] for si in self.kinetic.stars]]
+        self.kineticsvWyckoff = [(svW[0], svW[1]) for svW in
+                                 self.invmap[self.kinetic.states_ij[[si[0] for si in self.kinetic.stars]]].tolist()]
         self.omega0vacancyWyckoff = [(self.invmap[jumplist[0][0][0]], self.invmap[jumplist[0][0][1]])
                                      for jumplist in self.om0_jn]
 
@@ -1130,7 +1136,7 @@ class VacancyMediated(object):
                                                                zip(HDF5group['jump_ij'][()],
                                                                    HDF5group['jump_dx'][()])],
                                                               HDF5group['jump_index'])
-        diffuser.om0_jn = copy.deepcopy(diffuser.jumpnetwork)
+        diffuser.om0_jn = [[(ij, dx.copy()) for ij, dx in jlist] for jlist in diffuser.jumpnetwork]
 
         # objects with their own addhdf5 functionality:
         diffuser.GFcalc = GFcalc.GFCrystalcalc.loadhdf5(diffuser.crys, HDF5group['GFcalc'])
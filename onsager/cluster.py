@@ -510,6 +510,28 @@ def makeVacancyClusters(crys, chem, clusterexp):
     return Vacclusterexp
 
 
+def morton_encode_3d(x, y, z):
+    """
+    Interleave the bits of three non-negative integer coordinates into a single Morton
+    (Z-order) key, so that points that are close on a lattice have close keys.
+
+    :param x: non-negative integer (or array of integers), < 2**21
+    :param y: non-negative integer (or array of integers), < 2**21
+    :param z: non-negative integer (or array of integers), < 2**21
+    :return key: Morton key (or array of keys) as uint64
+    """
+    def spread(v):
+        """Spread the lowest 21 bits of v out to every third bit"""
+        v = np.asarray(v, dtype=np.uint64) & np.uint64(0x1fffff)
+        v = (v | (v << np.uint64(32))) & np.uint64(0x1f00000000ffff)
+        v = (v | (v << np.uint64(16))) & np.uint64(0x1f0000ff0000ff)
+        v = (v | (v << np.uint64(8))) & np.uint64(0x100f00f00f00f00f)
+        v = (v | (v << np.uint64(4))) & np.uint64(0x10c30c30c30c30c3)
+        v = (v | (v << np.uint64(2))) & np.uint64(0x1249249249249249)
+        return v
+
+    return spread(x) | (spread(y) << np.uint64(1)) | (spread(z) << np.uint64(2))
+
 
 class MonteCarloSampler(object):
     """
@@ -561,6 +583,7 @@ class MonteCarloSampler(object):
                 siteinteract, interactvalue, self.jumps, self.interactrange = \
                     supercell.jumpnetworkevaluator_vacancy(spectator_occ, clusterexp, enevalues, chem, jumpnetwork,
                                                            KRAvalues, TSclusters, TSvalues, siteinteract, interactvalue)
+        siteinteract, interactvalue = self.mortonorder(siteinteract, interactvalue)
         # convert from lists to arrays:
         self.Ninteract = np.array([len(inter) for inter in siteinteract])
         # see https://stackoverflow.com/questions/38619143/convert-python-sequence-to-numpy-array-filling-missing-values
@@ -569,6 +592,40 @@ class MonteCarloSampler(object):
         # to be initialized with start()
         self.occ, self.clustercount, self.occupied_set, self.unoccupied_set = None, None, None, None
 
+    def mortonorder(self, siteinteract, interactvalue):
+        """
+        Renumber the energy interactions so that they follow a Morton (Z-order) curve through
+        the supercell translations of their lowest-indexed site; interactions touched by
+        neighboring sites then sit next to each other in ``clustercount`` and ``interactvalue``.
+        The (jump) interactions past ``Nenergy`` are left alone, as they are indexed by
+        ``interactrange``. Each list in ``siteinteract`` is returned sorted, so the energy
+        interactions always come first.
+
+        :param siteinteract: list of lists of interactions for each site
+        :param interactvalue: list of interaction values
+        :return siteinteract: list of lists of renumbered interactions for each site
+        :return interactvalue: list of renumbered interaction values
+        """
+        Nsites, Nmobile = len(siteinteract), self.supercell.Nmobile
+        repsite = np.full(self.Nenergy, Nsites, dtype=int)
+        for i, interact in enumerate(siteinteract):
+            for m in interact:
+                if m < self.Nenergy and repsite[m] == Nsites:
+                    repsite[m] = i
+        # interactions without any mobile site (the constant term) go to the end:
+        key = np.full(self.Nenergy, np.iinfo(np.uint64).max, dtype=np.uint64)
+        hassite = repsite < Nsites
+        trans = np.zeros((self.Nenergy, 3), dtype=int)
+        translist = np.array(self.supercell.translist)
+        trans[hassite, :translist.shape[1]] = translist[repsite[hassite] // Nmobile]
+        key[hassite] = morton_encode_3d(trans[hassite, 0], trans[hassite, 1], trans[hassite, 2])
+        perm = np.lexsort((repsite, key))
+        newindex = np.arange(len(interactvalue))
+        newindex[perm] = np.arange(self.Nenergy)
+        interactvalue = [interactvalue[m] for m in perm] + list(interactvalue[self.Nenergy:])
+        siteinteract = [sorted(newindex[m] for m in interact) for interact in siteinteract]
+        return siteinteract, interactvalue
+
     def start(self, occ):
         """
         Initialize with an occupancy, and prepare for future calculations.
@@ -704,7 +761,7 @@ class MonteCarloSampler(object):
 
 
 from numba.experimental import jitclass          # import the decorator
-from numba import int64, float64    # import the types
+from numba import int64, uint64, float64    # import the types
 
 # our signature for our object
 MonteCarloSamplerSpec = [
@@ -725,12 +782,23 @@ MonteCarloSamplerSpec = [
     ('Nunocc', int64),
     ('occupied_set', int64[:]),
     ('unoccupied_set', int64[:]),
-    ('index', int64[:])
+    ('index', int64[:]),
+    ('rng_state', uint64[:])
 ]
 
+# xoshiro256** jump polynomial: advances the generator state by 2^128 draws
+XOSHIRO_JUMP = np.array([0x180ec6d33cfd0aba, 0xd5a61266f0c9392c, 0xa9582618e03fc9aa, 0x39abdc4529b1661c],
+                        dtype=np.uint64)
+
 # needed to convert internals of a MonteCarloSampler into the form that can be used by our jit version:
-def MonteCarloSampler_param(MCsampler):
-    """Takes in a MCsampler, returns a dictionary of all the parameters for the jit-version"""
+def MonteCarloSampler_param(MCsampler, seed=None):
+    """
+    Takes in a MCsampler, returns a dictionary of all the parameters for the jit-version
+
+    :param MCsampler: MonteCarloSampler to convert
+    :param seed: (optional) seed for the internal random number generator of the jit-version
+    :return param: dictionary of parameters for MonteCarloSampler_jit
+    """
     param = {}
     param['Nenergy'] = MCsampler.Nenergy
     # to be changed if there are jumps
@@ -798,6 +866,7 @@ def MonteCarloSampler_param(MCsampler):
     param['occupied_set'] = occupied_set
     param['unoccupied_set'] = unoccupied_set
     param['index'] = index
+    param['rng_state'] = np.random.SeedSequence(seed).generate_state(4, dtype=np.uint64)
     return param
 
 
@@ -808,7 +877,7 @@ class MonteCarloSampler_jit(object):
     """
     def __init__(self, Nenergy, Njumps, jump_ij, jump_dx, jump_Q, interactrange,
                  Ninteract, siteinteract, interactvalue, Nsites, occ, clustercount,
-                 dcluster, Nocc, Nunocc, occupied_set, unoccupied_set, index):
+                 dcluster, Nocc, Nunocc, occupied_set, unoccupied_set, index, rng_state):
         """
         Setup a jit-version of a MonteCarloSampler from an existing one.
 
@@ -836,15 +905,26 @@ class MonteCarloSampler_jit(object):
         self.occupied_set = occupied_set
         self.unoccupied_set = unoccupied_set
         self.index = index
+        self.rng_state = rng_state
+
+    def copy(self, jump=False):
+        """
+        Return a copy of the sampler. By default, the copy has the same random number generator
+        state, and so draws the *same* random numbers (and MCsweep trials) as the original; to run
+        a separate chain, use jump=True, which advances the copy's generator by 2^128 draws.
 
-    def copy(self):
-        """Return a copy of the sampler"""
-        return MonteCarloSampler_jit(self.Nenergy, self.Njumps, self.jump_ij.copy(),
+        :param jump: jump the random number generator of the copy ahead?
+        :return sampler: copy of the sampler
+        """
+        sampler = MonteCarloSampler_jit(self.Nenergy, self.Njumps, self.jump_ij.copy(),
                                      self.jump_dx.copy(), self.jump_Q.copy(), self.interactrange.copy(),
                                      self.Ninteract, self.siteinteract, self.interactvalue, self.Nsites,
                                      self.occ.copy(), self.clustercount.copy(), self.dcluster.copy(),
                                      self.Nocc, self.Nunocc, self.occupied_set.copy(),
-                                     self.unoccupied_set.copy(), self.index.copy())
+                                     self.unoccupied_set.copy(), self.index.copy(), self.rng_state.copy())
+        if jump:
+            sampler.jump()
+        return sampler
 
     def start(self, occ):
         """
@@ -981,3 +1061,55 @@ class MonteCarloSampler_jit(object):
             dE = self.deltaE_trial(occ_trial, unocc_trial)
             if dE < kTlogu[i]:
                 self.update(occ_trial, unocc_trial)
+
+    def random(self):
+        """
+        Next uniform random number in [0, 1) from our internal xoshiro256** generator;
+        the state in rng_state is advanced in place.
+
+        :return u: uniform random number in [0, 1)
+        """
+        s = self.rng_state
+        x = s[1] * np.uint64(5)
+        x = ((x << np.uint64(7)) | (x >> np.uint64(57))) * np.uint64(9)
+        t = s[1] << np.uint64(17)
+        s[2] ^= s[0]
+        s[3] ^= s[1]
+        s[1] ^= s[2]
+        s[0] ^= s[3]
+        s[2] ^= t
+        s[3] = (s[3] << np.uint64(45)) | (s[3] >> np.uint64(19))
+        return (x >> np.uint64(11)) * (1. / 9007199254740992.)
+
+    def jump(self):
+        """
+        Advance our random number generator by 2^128 draws (the xoshiro256** jump function); the
+        new stream does not overlap with the old one for any practical number of draws.
+        """
+        t = np.zeros(4, dtype=np.uint64)
+        for i in range(4):
+            for b in range(64):
+                if (XOSHIRO_JUMP[i] >> np.uint64(b)) & np.uint64(1):
+                    for n in range(4):
+                        t[n] ^= self.rng_state[n]
+                self.random()
+        for n in range(4):
+            self.rng_state[n] = t[n]
+
+    def MCsweep(self, Ntrials, kT):
+        """
+        Run Ntrials MC swap trials, drawing all of the random numbers from our internal
+        generator (rather than needing random vectors as in MCmoves), and do the updates.
+
+        :param Ntrials: number of trial moves
+        :param kT: temperature (in energy units)
+        """
+        # a completely full or empty lattice has no swaps to try
+        if self.Nocc == 0 or self.Nunocc == 0:
+            return
+        for i in range(Ntrials):
+            occ_trial = self.unoccupied_set[int(self.random() * self.Nunocc)]
+            unocc_trial = self.occupied_set[int(self.random() * self.Nocc)]
+            dE = self.deltaE_trial(occ_trial, unocc_trial)
+            if dE < -kT * np.log(1. - self.random()):
+                self.update(occ_trial, unocc_trial)
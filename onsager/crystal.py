@@ -782,13 +782,13 @@ class Crystal(object):
         # now, check for "aesthetics" of our basis choice
         shift = np.zeros(self.dim)
         for d in range(self.dim):
-            if np.any([np.isclose(u[d], 0, atol=self.threshold)
-                       for atomlist in self.basis for u in atomlist]):
+            if any(np.isclose(u[d], 0, atol=self.threshold)
+                   for atomlist in self.basis for u in atomlist):
                 shift[d] = 0
-            elif np.any([np.isclose(u[d], 0.5, atol=self.threshold)
-                         for atomlist in self.basis for u in atomlist]):
+            elif any(np.isclose(u[d], 0.5, atol=self.threshold)
+                     for atomlist in self.basis for u in atomlist):
                 shift[d] = 0.5
-            elif sum([1 for atomlist in self.basis for u in atomlist if u[d] < 0.25 or u[d] > 0.75]) > self.N / 2:
+            elif sum(1 for atomlist in self.basis for u in atomlist if u[d] < 0.25 or u[d] > 0.75) > self.N / 2:
                 shift[d] = 0.5
         self.basis = [[incell(atom + shift) for atom in atomlist] for atomlist in self.basis]
 
@@ -838,9 +838,9 @@ class Crystal(object):
             for atomlist, spinlist in zip(self.basis, spins):
                 for u, s in zip(atomlist, spinlist):
                     # edited to only check against translations with the same spin:
-                    if np.all([not self.__iszero__(inhalf(u + t - v))
-                               for v, vs in zip(atomlist, spinlist)
-                               if self.__isclose__(s, vs)]):
+                    if all(not self.__iszero__(inhalf(u + t - v))
+                           for v, vs in zip(atomlist, spinlist)
+                           if self.__isclose__(s, vs)):
                         trans = False
                         break
             if trans: break
@@ -1248,6 +1248,18 @@ class Crystal(object):
             if type(x) is not np.ndarray: raise TypeError
         return np.dot(g.cartrot, x) + np.dot(self.lattice, g.trans)
 
+    def cartrotarray(self):
+        """
+        Cartesian rotations of all of our group operations, stacked in the iteration order of G;
+        evaluated when first needed, and kept as long as G is unchanged.
+
+        :return cartrot: array[NG][3][3] of g.cartrot for g in G
+        """
+        cache = self.__dict__.get('cartrotcache')
+        if cache is None or cache[0] is not self.G:
+            cache = self.cartrotcache = (self.G, np.array([g.cartrot for g in self.G]))
+        return cache[1]
+
     def g_direc_equivalent(self, d1, d2, threshold=1e-8):
         """
         Tells us if two directions are equivalent by according to the space group
@@ -1257,7 +1269,8 @@ class Crystal(object):
         :param threshold: threshold for equality
         :return equivalent: True if equivalent by a point group operation
         """
-        return any(np.all(abs(d1 - self.g_direc(g, d2)) < threshold) for g in self.G)
+        gd2 = np.dot(self.cartrotarray(), d2)  # every g*d2 at once
+        return bool(np.any(np.all(abs(gd2 - d1) < threshold, axis=1)))
 
     def genpoint(self):
         """
@@ -1299,7 +1312,7 @@ class Crystal(object):
         lis = []
         zero = np.zeros(self.dim, dtype=int)
         for u in (self.g_vect(g, zero, uvec)[1] for g in self.G):
-            if not np.any([self.__isclose__(u, u1) for u1 in lis]):
+            if not any(self.__isclose__(u, u1) for u1 in lis):
                 lis.append(u)
         return lis
 
@@ -1429,18 +1442,14 @@ class Crystal(object):
           ``((i,j), dx)`` corresponding to jump from :math:`i \\to j` with vector :math:`\mathbf{\delta x}`
         """
 
-        # should we consider changing the lists to tuples? Not sure if there's any efficiency gain
-        def inlist(tup, dx, lis):
-            """Determines if (i,j), dx is in our list"""
-            # a little confusing: run through all transition tuples, see if we find our example
-            return any(tup == ij and self.__isclose__(dx, v) for translist in lis for ij, v in translist)
-
         r2 = cutoff * cutoff
         nmax = [int(np.round(np.sqrt(r2/self.metric[i, i]))) + 1
                 for i in range(self.dim)]
         nranges = [range(-n, n+1) for n in nmax]
         supervect = [np.array(ntup) for ntup in itertools.product(*nranges)]
         lis = []
+        # every transition in lis, as (i, j, R): the lattice vector R from i to j identifies dx exactly
+        seen = set()
         center = np.zeros(self.dim, dtype=int)
         for i, u0 in enumerate(self.basis[chem]):
             for j, u1 in enumerate(self.basis[chem]):
@@ -1449,17 +1458,19 @@ class Crystal(object):
                     dx = self.unit2cart(n, du)
                     if np.dot(dx, dx) > 0 and np.dot(dx, dx) < r2:
                         # we have a valid transition; first check that we haven't already looked at it
-                        if not inlist((i, j), dx, lis):
+                        if (i, j) + tuple(n.tolist()) not in seen:
                             trans = []
                             for g in self.G:
                                 # rotate through all combinations of i->j using space group symmetry
                                 R1, ind1 = self.g_pos(g, center, (chem, i))
                                 R2, ind2 = self.g_pos(g, n, (chem, j))
                                 tup = (ind1[1], ind2[1])
-                                dx = self.pos2cart(R2, ind2) - self.pos2cart(R1, ind1)
-                                if not any(tup == ij and self.__isclose__(dx, v) for ij, v in trans):
+                                key = tup + tuple((R2 - R1).tolist())
+                                if key not in seen:
+                                    dx = self.pos2cart(R2, ind2) - self.pos2cart(R1, ind1)
                                     trans.append((tup, dx))
                                     trans.append(((tup[1], tup[0]), -dx))
+                                    seen.update((key, (tup[1], tup[0]) + tuple((R1 - R2).tolist())))
                             lis.append(trans)
         # now for collision detection:
         if type(closestdistance) is list:
@@ -1493,8 +1504,12 @@ class Crystal(object):
                             if np.isclose(d2, mindist2) or d2 < mindist2:
                                 # lis.remove(trans)
                                 lis.pop(ntrans)
-        lis.sort(key=lambda entry: min(i + j + 1e-3 * np.dot(dx, dx) for (i, j), dx in entry))
-        return lis
+        # sort by min(i + j + 1e-3 * dx.dx) over each list of transitions (stable, like list.sort)
+        sortkeys = []
+        for entry in lis:
+            DX = np.array([dx for ij, dx in entry])
+            sortkeys.append(np.min(np.array([i + j for (i, j), dx in entry]) + 1e-3 * np.einsum('ij,ij->i', DX, DX)))
+        return [lis[n] for n in np.argsort(sortkeys, kind='stable').tolist()]
 
     def jumpnetwork2lattice(self, chem, jumpnetwork):
         """
@@ -1541,14 +1556,16 @@ class Crystal(object):
         #                     for n1 in range(-Nmesh[1] // 2 + 1, Nmesh[1] // 2 + 1)
         #                     for n2 in range(-Nmesh[2] // 2 + 1, Nmesh[2] // 2 + 1)])
         kdiv = [np.linspace(1/2,-1/2,Nm,endpoint=False) for Nm in Nmesh]
-        kptfull = np.array([np.dot(self.reciplatt, ktup) for ktup in itertools.product(*kdiv)])
+        kptfull = np.dot(np.array(list(itertools.product(*kdiv))), self.reciplatt.T)
         # run through list to ensure that all k-points are inside the BZ
-        Gmin = min(np.dot(G, G) for G in self.BZG)
-        for k in kptfull:
-            if np.dot(k, k) >= Gmin:
-                for G in self.BZG:
-                    if np.dot(k, G) > np.dot(G, G):
-                        k -= 2. * G
+        BZG = np.array(self.BZG)
+        G2list = np.einsum('ij,ij->i', BZG, BZG)
+        Gmin = G2list.min()
+        for n in np.flatnonzero(np.einsum('ij,ij->i', kptfull, kptfull) >= Gmin):
+            k = kptfull[n]  # a view, so that we shift the k-point in place
+            for G, G2 in zip(BZG, G2list.tolist()):
+                if np.dot(k, G) > G2:
+                    k -= 2. * G
         return kptfull
 
     def reducekptmesh(self, kptfull, threshold=None):
@@ -1562,12 +1579,15 @@ class Crystal(object):
         :return weight: array[Nsymm] of weights (integrates to 1)
         """
         eps = self.threshold if threshold is None else threshold
-        kptlist = list(kptfull)
-        Nkpt = len(kptlist)
-        kptlist.sort(key=lambda k: np.vdot(k, k))
+        kptfull = np.asarray(kptfull)
+        Nkpt = len(kptfull)
+        # stable sort by magnitude, as with kptlist.sort(key=lambda k: np.vdot(k, k))
+        k2full = np.einsum('ij,ij->i', kptfull, kptfull)
+        order = np.argsort(k2full, kind='stable')
+        kptlist, k2list = list(kptfull[order]), k2full[order].tolist()
         k2_indices = []
-        k2old = np.vdot(kptlist[0], kptlist[0])
-        for i, k2 in enumerate([np.vdot(k, k) for k in kptlist]):
+        k2old = k2list[0]
+        for i, k2 in enumerate(k2list):
             if k2 > (k2old + eps):
                 k2_indices.append(i)
                 k2old = k2
@@ -1577,23 +1597,31 @@ class Crystal(object):
         wsym = []  # unscaled at this point
         kmin = 0
         basewt = 1 / Nkpt
+        Gcartrot = self.cartrotarray()
         for kmax in k2_indices:
             complist = []
             symmcomplist = []
             wtlist = []
+            symmindex = {}  # images of our symmetry points, rounded to eps, -> index of symmetry point
             for k in kptlist[kmin:kmax]:
-                match = False
-                for i, symmcomp in enumerate(symmcomplist):
-                    # if any(np.allclose(k, gk, rtol=0, atol=threshold) for gk in symmcomp):
-                    if any(np.all(abs(k - gk) < eps) for gk in symmcomp):
-                        # update weight, kick out
-                        wtlist[i] += basewt
-                        match = True
-                        continue
-                if not match:
+                i = symmindex.get(tuple(np.round(k / eps).astype(int).tolist()))
+                if i is None:
+                    # rounding can split points that straddle a boundary, so check directly before adding
+                    for i, symmcomp in enumerate(symmcomplist):
+                        # if any(np.allclose(k, gk, rtol=0, atol=threshold) for gk in symmcomp):
+                        if any(np.all(abs(k - gk) < eps) for gk in symmcomp): break
+                    else:
+                        i = None
+                if i is not None:
+                    # update weight
+                    wtlist[i] += basewt
+                else:
                     # new symmetry point!
+                    symmcomp = np.dot(Gcartrot, k)
+                    for gkey in np.round(symmcomp / eps).astype(int).tolist():
+                        symmindex.setdefault(tuple(gkey), len(complist))
                     complist.append(k)
-                    symmcomplist.append([self.g_direc(g, k) for g in self.G])
+                    symmcomplist.append(symmcomp)
                     wtlist.append(basewt)
             kptsym += complist
             wsym += wtlist
@@ -1692,13 +1720,14 @@ def DB_disp4(pdbcontainer, mdbcontainer, obj1, obj2):
     if not (true_basis_len and true_crys):
         raise TypeError("Different crystal structures entered for pure and dumbbell states")
 
-    true_site_len = all([len(chem1) == len(chem2) for chem1, chem2 in
-                         zip(mdbcontainer.crys.basis, pdbcontainer.crys.basis)])
+    true_site_len = all(len(chem1) == len(chem2) for chem1, chem2 in
+                        zip(mdbcontainer.crys.basis, pdbcontainer.crys.basis))
     if not true_site_len:
         raise TypeError("Different site numbers entered for pure and dumbbell states for same chemistries")
 
-    true_site_locs = all([[np.allclose(arr1, arr2) for arr1, arr2 in zip(chem1, chem2)]for chem1, chem2 in
-                          zip(mdbcontainer.crys.basis, pdbcontainer.crys.basis)])
+    true_site_locs = all(np.allclose(arr1, arr2) for chem1, chem2 in
+                         zip(mdbcontainer.crys.basis, pdbcontainer.crys.basis)
+                         for arr1, arr2 in zip(chem1, chem2))
 
     if not true_site_locs:
         raise TypeError("basis sites are at different locations for the two containers.")
@@ -1735,6 +1764,7 @@ class pureDBContainer(object):
         self.threshold = crys.threshold
         self.invmap = self.invmapping(self.symIndlist)
         # Invmap says which (i, or) pair is present in which symmetric (i, or) list
+        self.iorindex = self.geniorindex()
 
     @staticmethod
     def invmapping(symindlist):
@@ -1772,7 +1802,7 @@ class pureDBContainer(object):
         iorlist = []
         for wyckind, wycksites in enumerate(sitelist):
             orlist = self.family[wyckind]  # Get the orientations allowed on the given Wyckoff set.
-            if np.allclose(orlist[0], np.zeros(self.crys.dim)):
+            if np.allclose(orlist[0], 0):
                 # If zero vector is entered, then that means this set does not have dumbbells.
                 continue
             site = wycksites[0]  # Get the representative site of the Wyckoff set.
@@ -1793,19 +1823,18 @@ class pureDBContainer(object):
         """
         G = []
         G_crys = {}
+        sites = np.array([i for i, o in iorlist], dtype=int)
+        orients = np.array([o for i, o in iorlist], dtype=float).reshape(len(iorlist), -1)
         for g in crys.G:
-            # Will have indexmap for each groupop
-            indexmap = []
-            for (i, o) in iorlist:
-                # Need the elements of indexmap
-                R, (ch, i_new) = crys.g_pos(g, np.zeros(self.crys.dim), (chem, i))
-                o_new = crys.g_direc(g, o)
-
-                for idx2, (i2, o2) in enumerate(iorlist):
-                    if i2 == i_new and (np.allclose(o2, o_new, atol=crys.threshold) or
-                                        np.allclose(o2, -o_new, atol=crys.threshold)):
-                        indexmap.append(idx2)
-                        break
+            # Will have indexmap for each groupop: the first (i,or) matching each rotated (i,or)
+            sites_new = np.array([g.indexmap[chem][i] for i in sites.tolist()], dtype=int)
+            orients_new = np.dot(orients, g.cartrot.T)
+            match = (sites[np.newaxis, :] == sites_new[:, np.newaxis]) & \
+                    (np.all(np.isclose(orients[np.newaxis, :], orients_new[:, np.newaxis],
+                                       atol=crys.threshold), axis=-1) |
+                     np.all(np.isclose(orients[np.newaxis, :], -orients_new[:, np.newaxis],
+                                       atol=crys.threshold), axis=-1))
+            indexmap = np.argmax(match, axis=1)[np.any(match, axis=1)].tolist()
 
             gdumb = GroupOp(g.rot, g.trans, g.cartrot, tuple([tuple(indexmap)]))
             G.append(gdumb)
@@ -1887,10 +1916,10 @@ class pureDBContainer(object):
                 db2newneg = dumbbell(jnew.state1.iorind, -jnew.state2.R)
                 jnewneg = jump(db1newneg, db2newneg, jnew.c2, jnew.c1)
 
-                if not np.allclose(db1newneg.R, np.zeros(self.crys.dim), atol=1e-8):
+                if not np.allclose(db1newneg.R, 0, atol=1e-8):
                     raise RuntimeError("Initial state not at origin")
 
-                if np.allclose(dx, np.zeros(self.crys.dim)):
+                if np.allclose(dx, 0):
                     # First, make the equivalent rotation jump
                     jnew_equiv = jump(db1new, db2new, -jnew.c1, -jnew.c2)
                     # Check if the rotation jump has also been taken into account.
@@ -1965,6 +1994,24 @@ class pureDBContainer(object):
                             jumpindices.append(jindlist)
         return jumplist, jumpindices
 
+    def iorkey(self, i, o):
+        """
+        Hashable key for a (site, orientation) pair: the orientation is rounded to integer multiples
+        of the threshold.
+        """
+        return (i,) + tuple(np.rint(np.asarray(o) / self.threshold).astype(int).tolist())
+
+    def geniorindex(self):
+        """
+        Dictionary from iorkey to index in iorlist; as a pure dumbbell is unchanged by flipping its
+        orientation, both o and -o are included.
+        """
+        iorindex = {}
+        for idx, (i, o) in enumerate(self.iorlist):
+            iorindex.setdefault(self.iorkey(i, o), idx)
+            iorindex.setdefault(self.iorkey(i, -o), idx)
+        return iorindex
+
     def getIndex(self, t):
         """
         :param i: input site index
@@ -1972,6 +2019,10 @@ class pureDBContainer(object):
         (i, o) contained in t
         :return: idx (integer) - the index of (i, o) in the iorlist, if it exists.
         """
+        idx = self.iorindex.get(self.iorkey(*t))
+        if idx is not None:
+            return idx
+        # a miss can still be a match that rounded to a neighboring key:
         for idx, tup in enumerate(self.iorlist):
             if t[0] == tup[0] and (np.allclose(t[1], tup[1], atol=self.crys.threshold) or
                                    np.allclose(t[1], -tup[1], atol=self.crys.threshold)):
@@ -2008,6 +2059,7 @@ class mixedDBContainer(pureDBContainer):
         self.threshold = crys.threshold
         self.invmap = self.invmapping(self.symIndlist)
         # Invmap says which (i, or) pair is present in which symmetric (i, or) list
+        self.iorindex = self.geniorindex()
 
     def genmixedsets(self):
         """
@@ -2047,17 +2099,16 @@ class mixedDBContainer(pureDBContainer):
         """
         G = []
         G_crys = {}
+        sites = np.array([i for i, o in iorlist], dtype=int)
+        orients = np.array([o for i, o in iorlist], dtype=float).reshape(len(iorlist), -1)
         for g in crys.G:
-            # Will have indexmap for each groupop
-            indexmap = []
-            for (i, o) in iorlist:
-                # Need the elements of indexmap
-                R, (ch, i_new) = crys.g_pos(g, np.zeros(self.crys.dim), (chem, i))
-                o_new = crys.g_direc(g, o)
-                for idx2, (i2, o2) in enumerate(iorlist):
-                    if i2 == i_new and np.allclose(o2, o_new, atol=crys.threshold):
-                        indexmap.append(idx2)
-                        break
+            # Will have indexmap for each groupop: the first (i,or) matching each rotated (i,or)
+            sites_new = np.array([g.indexmap[chem][i] for i in sites.tolist()], dtype=int)
+            orients_new = np.dot(orients, g.cartrot.T)
+            match = (sites[np.newaxis, :] == sites_new[:, np.newaxis]) & \
+                    np.all(np.isclose(orients[np.newaxis, :], orients_new[:, np.newaxis],
+                                      atol=crys.threshold), axis=-1)
+            indexmap = np.argmax(match, axis=1)[np.any(match, axis=1)].tolist()
             gdumb = GroupOp(g.rot, g.trans, g.cartrot, tuple([tuple(indexmap)]))
             G.append(gdumb)
             G_crys[gdumb] = g
@@ -2116,9 +2167,9 @@ class mixedDBContainer(pureDBContainer):
 
                             jnew = jump(p1new, p2new, j.c1, j.c2)
                             # Place some sanity checks for safety, also helpful for tests
-                            if not np.allclose(jnew.state1.R_s, np.zeros(self.crys.dim), atol=self.crys.threshold):
+                            if not np.allclose(jnew.state1.R_s, 0, atol=self.crys.threshold):
                                 raise ValueError("The initial state is not at the origin unit cell")
-                            if not np.allclose(jnew.state1.db.R, np.zeros(self.crys.dim), atol=self.crys.threshold):
+                            if not np.allclose(jnew.state1.db.R, 0, atol=self.crys.threshold):
                                 raise ValueError("The solute is not at the same site as the dumbbell in mixed dumbbell")
                             if not np.allclose(jnew.state2.db.R, jnew.state2.R_s, atol=self.crys.threshold):
                                 raise ValueError("The solute is not at the same site as the dumbbell in mixed dumbbell")
@@ -2140,11 +2191,24 @@ class mixedDBContainer(pureDBContainer):
                         jumpindices.append(jindlist)
         return jumplist, jumpindices
 
+    def geniorindex(self):
+        """
+        Dictionary from iorkey to index in iorlist; o and -o are different mixed dumbbells.
+        """
+        iorindex = {}
+        for idx, (i, o) in enumerate(self.iorlist):
+            iorindex.setdefault(self.iorkey(i, o), idx)
+        return iorindex
+
     def getIndex(self, t):
         """
         :param t = (i, o) - (site, orientation) tuple
         :return: idx (integer) - the index of (i, o) in the iorlist, if it exists.
         """
+        idx = self.iorindex.get(self.iorkey(*t))
+        if idx is not None:
+            return idx
+        # a miss can still be a match that rounded to a neighboring key:
         for idx,tup in enumerate(self.iorlist):
             if t[0]==tup[0] and np.allclose(t[1], tup[1], atol = 1e-8):
                 return idx
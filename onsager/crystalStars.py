@@ -30,7 +30,7 @@ from onsager.DB_structs import *
 from onsager.DB_collisions import *
 import itertools
 from collections import defaultdict
-import time
+import time, weakref
 from functools import reduce
 # YAML tags
 PAIRSTATE_YAMLTAG = '!PairState'
@@ -50,6 +50,13 @@ class PairState(collections.namedtuple('PairState', 'i j R dx')):
     :param dx: Cartesian vector pointing from first to second member of pair
     """
 
+    def __new__(cls, i, j, R, dx):
+        """Construct the state, and evaluate its key and hash once (the state is immutable)"""
+        self = super().__new__(cls, i, j, R, dx)
+        self.__keycache__ = key = (i, j) + tuple(R)
+        self.__hashcache__ = hash(key)
+        return self
+
     @classmethod
     def zero(cls, n=0, dim=3):
         """Return a "zero" state"""
@@ -79,14 +86,21 @@ class PairState(collections.namedtuple('PairState', 'i j R dx')):
         """Determine if the dx value makes sense given everything else..."""
         return np.allclose(self.dx, np.dot(crys.lattice, self.R + crys.basis[chem][self.j] - crys.basis[chem][self.i]))
 
+    def _statekey(self):
+        """Tuple (i, j, R[0], R[1], ...) identifying the state; cached at construction"""
+        try:
+            return self.__keycache__
+        except AttributeError:
+            # made without going through __new__ (e.g., _make or _replace)
+            return (self.i, self.j) + tuple(self.R)
+
     def iszero(self):
         """Quicker than self == PairState.zero()"""
-        return self.i == self.j and np.all(self.R == 0)
+        return self.i == self.j and not any(self._statekey()[2:])
 
     def __eq__(self, other):
         """Test for equality--we don't bother checking dx"""
-        return isinstance(other, self.__class__) and \
-               (self.i == other.i and self.j == other.j and np.all(self.R == other.R))
+        return isinstance(other, self.__class__) and self._statekey() == other._statekey()
 
     def __ne__(self, other):
         """Inequality == not __eq__"""
@@ -95,7 +109,11 @@ class PairState(collections.namedtuple('PairState', 'i j R dx')):
     def __hash__(self):
         """Hash, so that we can make sets of states"""
         # return self.i ^ (self.j << 1) ^ (self.R[0] << 2) ^ (self.R[1] << 3) ^ (self.R[2] << 4)
-        return hash((self.i, self.j) + tuple(self.R))
+        try:
+            return self.__hashcache__
+        except AttributeError:
+            # made without going through __new__ (e.g., _make or _replace)
+            return hash(self._statekey())
 
     def __add__(self, other):
         """Add two states: works if and only if self.j == other.i
@@ -103,12 +121,19 @@ class PairState(collections.namedtuple('PairState', 'i j R dx')):
         Note: a + b != b + a, and may be that only one of those is even defined
         """
         if not isinstance(other, self.__class__): return NotImplemented
-        if self.iszero() and self.j == -1: return other
-        if other.iszero() and other.i == -1: return self
-        if self.j != other.i:
+        s = self.tryadd(other)
+        if s is None:
             raise ArithmeticError(
                 'Can only add matching endpoints: ({} {})+({} {}) not compatible'.format(self.i, self.j, other.i,
                                                                                          other.j))
+        return s
+
+    def tryadd(self, other):
+        """Add two states if possible (self + other), otherwise return None; quicker than
+        catching the ArithmeticError from + inside of loops"""
+        if self.j == -1 and self.iszero(): return other
+        if other.i == -1 and other.iszero(): return self
+        if self.j != other.i: return None
         return self.__class__(i=self.i, j=other.j, R=self.R + other.R, dx=self.dx + other.dx)
 
     def __neg__(self):
@@ -136,10 +161,16 @@ class PairState(collections.namedtuple('PairState', 'i j R dx')):
         if not isinstance(other, self.__class__): return NotImplemented
         # if self.iszero(): raise ArithmeticError('Cannot endpoint substract from zero')
         # if other.iszero(): raise ArithmeticError('Cannot endpoint subtract zero')
-        if self.i != other.i:
+        s = self.tryxor(other)
+        if s is None:
             raise ArithmeticError(
                 'Can only endpoint subtract matching starts: ({} {})^({} {}) not compatible'.format(self.i, self.j,
                                                                                                     other.i, other.j))
+        return s
+
+    def tryxor(self, other):
+        """Endpoint subtract two states if possible (self ^ other), otherwise return None"""
+        if self.i != other.i: return None
         return self.__class__(i=other.j, j=self.j, R=self.R - other.R, dx=self.dx - other.dx)
 
     def g(self, crys, chem, g):
@@ -169,7 +200,12 @@ class PairState(collections.namedtuple('PairState', 'i j R dx')):
 
     @classmethod
     def sortkey(cls, entry):
-        return np.dot(entry.dx, entry.dx)
+        """Magnitude squared of dx; evaluated once per state, and then cached"""
+        try:
+            return entry.__x2cache__
+        except AttributeError:
+            entry.__x2cache__ = x2 = magnitude2(entry.dx)
+            return x2
 
     @staticmethod
     def PairState_representer(dumper, data):
@@ -200,12 +236,10 @@ def PSlist2array(PSlist):
     :return dx: float[N][3]
     """
     N = len(PSlist)
-    ij = np.zeros((N, 2), dtype=int)
-    dim = len(PSlist[0].R)
-    R = np.zeros((N, dim), dtype=int)
-    dx = np.zeros((N, dim))
-    for n, PS in enumerate(PSlist):
-        ij[n, 0], ij[n, 1], R[n, :], dx[n, :] = PS.i, PS.j, PS.R, PS.dx
+    ij = np.fromiter(itertools.chain.from_iterable((PS.i, PS.j) for PS in PSlist),
+                     dtype=int, count=2 * N).reshape(N, 2)
+    R = np.array([PS.R for PS in PSlist], dtype=int)
+    dx = np.array([PS.dx for PS in PSlist], dtype=float)
     return ij, R, dx
 
 
@@ -218,7 +252,197 @@ def array2PSlist(ij, R, dx):
     :param dx: float[N][3]
     :return PSlist: list of pair states
     """
-    return [PairState(i=ij0[0], j=ij0[1], R=R0, dx=dx0) for ij0, R0, dx0 in zip(ij, R, dx)]
+    return [PairState(i=i0, j=j0, R=R[n], dx=dx[n]) for n, (i0, j0) in enumerate(ij.tolist())]
+
+
+def sortstates(PSlist, dim=3, threshold=1e-8):
+    """
+    Sort a list of pair states by magnitude (PairState.sortkey, to within threshold, with ties
+    broken by packed key; see sortorder), and return the sorted list along with its arrays
+    (as in PSlist2array).
+
+    :param PSlist: list of pair states
+    :param dim: dimension of lattice vectors (for an empty list)
+    :param threshold: threshold for equal magnitudes
+    :return PSlist: sorted list of pair states
+    :return ij: int_array[N][2] = (i,j)
+    :return R: int[N][dim]
+    :return dx: float[N][dim]
+    """
+    if len(PSlist) == 0:
+        return [], np.zeros((0, 2), dtype=int), np.zeros((0, dim), dtype=int), np.zeros((0, dim))
+    ij, R, dx = PSlist2array(PSlist)
+    order = sortorder(dx, packstates(ij, R), threshold)
+    return [PSlist[n] for n in order.tolist()], ij[order], R[order], dx[order]
+
+
+def magnitude2(dx):
+    """
+    Squared magnitude of displacement(s) dx, summed over the last axis; evaluated component by
+    component, so the result for a given dx is identical for one vector or an array of them.
+
+    :param dx: float[...][dim]
+    :return x2: float[...]
+    """
+    dx = np.asarray(dx)
+    x2 = dx[..., 0] * dx[..., 0]
+    for d in range(1, dx.shape[-1]):
+        x2 = x2 + dx[..., d] * dx[..., d]
+    return x2
+
+
+def sortorder(dx, keys, threshold=1e-8):
+    """
+    Canonical order for a list of pair states (as arrays): by squared magnitude, rounded to
+    threshold, with ties broken by packed key. The order does not depend on the order in which
+    the states were found, nor on roundoff in their displacements.
+
+    :param dx: float[N][dim]
+    :param keys: int[N] of packed keys (see packstates)
+    :param threshold: threshold for equal magnitudes
+    :return order: int[N] of indices that sort the states
+    """
+    return np.lexsort((keys, np.round(magnitude2(dx) / threshold)))
+
+
+def statedx(crys, chem, ij, R):
+    """
+    Displacement of each of a list of pair states (as arrays) from (i,j) and R alone, as in
+    PairState.fromcrys_latt; unlike the sum of the displacements of composed states, it does not
+    depend on the path by which a state was reached.
+
+    :param crys: crystal
+    :param chem: chemical index
+    :param ij: int_array[N][2] = (i,j)
+    :param R: int[N][dim]
+    :return dx: float[N][dim]
+    """
+    basis = np.array(crys.basis[chem]).reshape(-1, crys.dim)
+    u = R + basis[ij[:, 1]] - basis[ij[:, 0]]
+    # summed component by component, so each state is evaluated the same way wherever it appears
+    dx = np.zeros((len(ij), crys.dim))
+    for d in range(crys.dim):
+        dx += u[:, d, np.newaxis] * crys.lattice[np.newaxis, :, d]
+    return dx
+
+
+def packable(ij, R):
+    """
+    Mask of which pair states (as arrays) can be packed into keys by packstates: the indices
+    are in [0, 4096) and the components of R are in [-2048, 2048).
+
+    :param ij: int_array[N][2] = (i,j)
+    :param R: int[N][3]
+    :return packable: bool[N], True for states that can be packed
+    """
+    return np.all((ij >= 0) & (ij < 4096), axis=1) & np.all((R >= -2048) & (R < 2048), axis=1)
+
+
+def packstates(ij, R):
+    """
+    Pack the (i,j) indices and lattice vectors R of pair states into single integer keys
+    for fast lookups: 12 bits for each entry, with the components of R offset by 2048.
+    Keys are unique, as the indices must be below 4096 and the components of R must be
+    in [-2048, 2048) (see packable).
+
+    :param ij: int_array[N][2] = (i,j)
+    :param R: int[N][3]
+    :return keys: int[N] of keys
+    """
+    if not np.all(packable(ij, R)):
+        raise ValueError('Pair state indices or lattice vectors out of range for packing')
+    keys = ij[:, 0] | (ij[:, 1] << 12)
+    for d in range(R.shape[1]):
+        keys |= (R[:, d] + 2048) << (24 + 12 * d)
+    return keys
+
+
+def packstate(PS):
+    """
+    Integer key for a single pair state, consistent with packstates; None if the
+    indices or lattice vector are out of range for packing (so the state cannot be one of ours).
+
+    :param PS: pair state
+    :return key: integer key (or None)
+    """
+    if not (0 <= PS.i < 4096 and 0 <= PS.j < 4096): return None
+    key = PS.i | (PS.j << 12)
+    for d, Rd in enumerate(PS.R.tolist()):
+        if not -2048 <= Rd < 2048: return None
+        key |= (Rd + 2048) << (24 + 12 * d)
+    return key
+
+
+def zerostates(ij, R):
+    """
+    Mask of which pair states (as arrays) are zero: i==j and R==0, vectorized version of iszero.
+
+    :param ij: int_array[N][2] = (i,j)
+    :param R: int[N][3]
+    :return zero: bool[N], True for zero pair states
+    """
+    return (ij[:, 0] == ij[:, 1]) & np.all(R == 0, axis=1)
+
+
+def composestates(ij1, R1, dx1, ij2, R2, dx2):
+    """
+    Take in two lists of pair states (as arrays), return all of the valid sums
+    PS1 + PS2 (that is, where PS1.j == PS2.i) as arrays, ordered by PS1 and then PS2.
+
+    :param ij1: int_array[N1][2] = (i,j) for first list
+    :param R1: int[N1][3]
+    :param dx1: float[N1][3]
+    :param ij2: int_array[N2][2] = (i,j) for second list
+    :param R2: int[N2][3]
+    :param dx2: float[N2][3]
+    :return ij: int_array[N][2] = (i,j) of sums
+    :return R: int[N][3]
+    :return dx: float[N][3]
+    """
+    a, b = np.nonzero(ij1[:, 1, np.newaxis] == ij2[np.newaxis, :, 0])
+    return np.column_stack((ij1[a, 0], ij2[b, 1])), R1[a] + R2[b], dx1[a] + dx2[b]
+
+
+def growarray(a, N):
+    """
+    Extend a 1d array to length N; the new entries are zero. Storage grows geometrically: the
+    returned array is a view into a larger buffer, so that repeated growth (e.g., successive
+    StarSet.__iadd__) reuses the spare capacity rather than copying every time.
+
+    :param a: 1d array, to be grown
+    :param N: new length, at least len(a)
+    :return a: 1d array of length N, with a[:len(a)] unchanged
+    """
+    Nold = len(a)
+    buffer = a.base
+    # can only reuse the buffer if a is its leading (contiguous) slice
+    if isinstance(buffer, np.ndarray) and buffer.ndim == 1 and buffer.dtype == a.dtype and \
+            len(buffer) >= N and a.strides == buffer.strides and \
+            a.__array_interface__['data'][0] == buffer.__array_interface__['data'][0]:
+        buffer[Nold:N] = 0
+    else:
+        buffer = np.zeros(max(2 * Nold, N), dtype=a.dtype)
+        buffer[:Nold] = a
+    return buffer[:N]
+
+
+def groupstars(keys, offset=0):
+    """
+    Group states into stars by their canonical keys (see StarSet.canonicalkeys). Stars are
+    ordered by their first state, and the states in each star are in increasing order.
+
+    :param keys: int[N] of canonical keys
+    :param offset: index of the first state
+    :return stars: list of lists of state indices (starting at offset)
+    """
+    uniquekeys, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    # renumber the unique keys in order of first appearance
+    starorder = np.empty(len(first), dtype=int)
+    starorder[np.argsort(first)] = np.arange(len(first))
+    stars = [[] for n in range(len(first))]
+    for xi, si in enumerate(starorder[inverse].tolist(), offset):
+        stars[si].append(xi)
+    return stars
 
 
 def doublelist2flatlistindex(listlist):
@@ -263,6 +487,9 @@ class StarSet(object):
     In this case, ``shells`` = number of successive "jumps" from a state. As an example,
     in FCC, 1 shell = 1st neighbor, 2 shell = 1-4th neighbors.
     """
+    # results of generate(), for each crystal: {(chem, jumplist, Nshells, threshold, originstates): (states, ...)}
+    # held weakly, so that entries go away with their crystal
+    generatecache = weakref.WeakKeyDictionary()
 
     def __init__(self, jumpnetwork, crys, chem, Nshells=0, originstates=False, lattice=False):
         """
@@ -283,9 +510,11 @@ class StarSet(object):
         # jumplist: list of jumps, as pair states (i=initial state, j=final state)
         # states: list of pair states, out to Nshells
         # Nstates: size of list
+        # states_ij, states_R, states_dx: arrays [Nstates][2], [Nstates][dim] of the (i,j), R and dx of each state
         # stars: list of lists of indices into states; each list are states equivalent by symmetry
         # Nstars: size of list
         # index[Nstates]: index of star that state belongs to
+        # statekeys[Nstates]: integer key of each state (packstates); keyindex[key] = (state index, star index)
 
         # empty StarSet
         if all(x is None for x in (jumpnetwork, crys, chem)): return
@@ -304,6 +533,7 @@ class StarSet(object):
                 self.jumplist.append(PS)
         self.crys = crys
         self.chem = chem
+        self.gengrouptables()
         self.generate(Nshells, threshold=crys.threshold, originstates=originstates)
 
     def __str__(self):
@@ -315,6 +545,91 @@ class StarSet(object):
                 str += "  {}: {}\n".format(i, self.states[i])
         return str
 
+    def gengrouptables(self):
+        """
+        Construct arrays of the group operations acting on sites of our chemistry, so that
+        the orbit of a state can be evaluated for all group operations at once (see orbit).
+        G_rot and G_cartrot are the lattice and Cartesian rotations, G_perm[g, i] is the basis
+        index that i maps into, and G_shift[g, i] the lattice vector it gets shifted by.
+        """
+        G, chem = self.crys.G, self.chem
+        zero = np.zeros(self.crys.dim, dtype=int)
+        self.G_rot = np.array([g.rot for g in G], dtype=int)
+        self.G_cartrot = np.array([g.cartrot for g in G])
+        self.G_perm = np.array([g.indexmap[chem] for g in G], dtype=int)
+        self.G_shift = np.array([[self.crys.g_pos(g, zero, (chem, i))[0]
+                                  for i in range(len(self.crys.basis[chem]))] for g in G], dtype=int)
+
+    def orbit(self, PS):
+        """
+        Apply every group operation to a pair state; equivalent to (but faster than)
+        ``[PS.g(crys, chem, g) for g in crys.G]``.
+
+        :param PS: pair state
+        :return gPSlist: list of g*PS, for g in the same order as crys.G
+        """
+        gR = np.dot(self.G_rot, PS.R) + self.G_shift[:, PS.j] - self.G_shift[:, PS.i]
+        gdx = np.dot(self.G_cartrot, PS.dx)
+        return [PairState(i=gi, j=gj, R=gR0, dx=gdx0)
+                for gi, gj, gR0, gdx0 in zip(self.G_perm[:, PS.i].tolist(), self.G_perm[:, PS.j].tolist(), gR, gdx)]
+
+    def canonicalkeys(self, ij, R):
+        """
+        Canonical key for each of a list of states (as arrays): the smallest packed key
+        (see packstates) over the orbit of each state, so two states are equivalent by
+        symmetry if and only if they have the same canonical key. All group operations are
+        applied to all states at once.
+
+        :param ij: int_array[N][2] = (i,j)
+        :param R: int[N][3]
+        :return keys: int[N] of canonical keys
+        """
+        NG, N = len(self.G_rot), len(ij)
+        gij, gR = self.orbitarrays(ij, R)
+        return packstates(gij.reshape(NG * N, 2), gR.reshape(NG * N, -1)).reshape(NG, N).min(axis=0)
+
+    def orbitarrays(self, ij, R):
+        """
+        Apply every group operation to each of a list of states (as arrays); array version of orbit.
+
+        :param ij: int_array[N][2] = (i,j)
+        :param R: int[N][3]
+        :return gij: int_array[NG][N][2] of (i,j) for g*state, for g in the same order as crys.G
+        :return gR: int[NG][N][3] of R for g*state
+        """
+        gij = self.G_perm[:, ij]
+        gR = np.einsum('gab,nb->gna', self.G_rot, R) + self.G_shift[:, ij[:, 1]] - self.G_shift[:, ij[:, 0]]
+        return gij, gR
+
+    def groupmap(self):
+        """
+        Index of the image of each of our states under each group operation, so that
+        ``states[Gmap[g, xi]] == states[xi].g(crys, chem, crys.G[g])``. Evaluated when needed,
+        and kept until our states change.
+
+        :return Gmap: int[NG][Nstates] of state indices (-1 if the image is not in our set)
+        """
+        Gmapcache = self.__dict__.get('groupmapcache')
+        if Gmapcache is None or Gmapcache[0] is not self.statekeys:
+            NG, N = len(self.G_rot), self.Nstates
+            gij, gR = self.orbitarrays(self.states_ij, self.states_R)
+            Gmap = self.stateindices(gij.reshape(NG * N, 2), gR.reshape(NG * N, -1)).reshape(NG, N)
+            Gmapcache = self.groupmapcache = (self.statekeys, Gmap)
+        return Gmapcache[1]
+
+    def negmap(self):
+        """
+        Index of the negation of each of our states, so that ``states[negmap[xi]] == -states[xi]``.
+        Evaluated when needed, and kept until our states change.
+
+        :return negmap: int[Nstates] of state indices (-1 if the negation is not in our set)
+        """
+        negcache = self.__dict__.get('negmapcache')
+        if negcache is None or negcache[0] is not self.statekeys:
+            negcache = self.negmapcache = (self.statekeys,
+                                           self.stateindices(self.states_ij[:, ::-1], -self.states_R))
+        return negcache[1]
+
     def generate(self, Nshells, threshold=1e-8, originstates=False):
         """
         Construct the points and the stars in the set. Does not include "origin states" by default; these
@@ -327,72 +642,83 @@ class StarSet(object):
         """
         if Nshells == getattr(self, 'Nshells', -1): return
         self.Nshells = Nshells
-        if Nshells > 0:
-            stateset = set(self.jumplist)
-        else:
-            stateset = set([])
-        lastshell = stateset.copy()
+        cachekey = (self.chem, tuple((PS.i, PS.j) + tuple(PS.R.tolist()) for PS in self.jumplist),
+                    Nshells, threshold, originstates)
+        cache = self.generatecache.setdefault(self.crys, {})
+        if cachekey in cache:
+            self.installgenerate(*cache[cachekey])
+            return
+        dim = self.crys.dim
+        # build up the shells as arrays, keeping track of the states we have by their packed keys
+        # shells[n-1] = (statekeys, statearrays, lastshell) after n shells; kept so that a larger
+        # Nshells continues from the shells that we've already built
+        shells = cache.setdefault('shells', {}).setdefault(cachekey[:2] + (originstates,), [])
         if originstates:
-            for i in range(len(self.crys.basis[self.chem])):
-                stateset.add(PairState.zero(i, self.crys.dim))
-        for i in range(Nshells - 1):
-            # add all NNvect to last shell produced, always excluding 0
-            # lastshell = [v1+v2 for v1 in lastshell for v2 in self.NNvect if not all(abs(v1 + v2) < threshold)]
-            nextshell = set([])
-            for s1 in lastshell:
-                for s2 in self.jumplist:
-                    # this try/except structure lets us attempt addition and kick out if not possible
-                    try:
-                        s = s1 + s2
-                    except:
-                        continue
-                    if not s.iszero():
-                        nextshell.add(s)
-                        stateset.add(s)
-            lastshell = nextshell
+            Nbasis = len(self.crys.basis[self.chem])
+            originarrays = [(np.column_stack((np.arange(Nbasis), np.arange(Nbasis))),
+                             np.zeros((Nbasis, dim), dtype=int), np.zeros((Nbasis, dim)))]
+        else:
+            originarrays = []
+        if Nshells > 0 and len(self.jumplist) > 0:
+            jump_ij, jump_R, jump_dx = PSlist2array(self.jumplist)
+            if len(shells) == 0:
+                keys, first = np.unique(packstates(jump_ij, jump_R), return_index=True)
+                lastshell = jump_ij[first], jump_R[first], jump_dx[first]
+                statearrays = [lastshell] + originarrays
+                shells.append((keys, tuple(statearrays), lastshell))
+            statekeys, statearrays, lastshell = shells[min(Nshells, len(shells)) - 1]
+            statearrays = list(statearrays)
+            for n in range(len(shells), Nshells):
+                # add all jumps to last shell produced, always excluding 0
+                ij, R, dx = composestates(*(lastshell + (jump_ij, jump_R, jump_dx)))
+                nonzero = ~zerostates(ij, R)
+                keys, first = np.unique(packstates(ij[nonzero], R[nonzero]), return_index=True)
+                lastshell = ij[nonzero][first], R[nonzero][first], dx[nonzero][first]
+                new = ~np.isin(keys, statekeys)
+                statekeys = np.concatenate((statekeys, keys[new]))
+                statearrays.append(tuple(a[new] for a in lastshell))
+                shells.append((statekeys, tuple(statearrays), lastshell))
+        else:
+            statearrays = [(np.zeros((0, 2), dtype=int), np.zeros((0, dim), dtype=int), np.zeros((0, dim)))] + \
+                          originarrays
         # now to sort our set of vectors (easiest by magnitude, and then reduce down:
-        self.states = sorted([s for s in stateset], key=PairState.sortkey)
+        ij, R = (np.concatenate(arrays) for arrays in tuple(zip(*statearrays))[:2])
+        dx = statedx(self.crys, self.chem, ij, R)
+        order = sortorder(dx, packstates(ij, R), threshold)
+        self.states_ij, self.states_R, self.states_dx = ij[order], R[order], dx[order]
+        self.states = array2PSlist(self.states_ij, self.states_R, self.states_dx)
         self.Nstates = len(self.states)
         if self.Nstates > 0:
-            x2_indices = []
-            x2old = np.dot(self.states[0].dx, self.states[0].dx)
-            for i, x2 in enumerate([np.dot(st.dx, st.dx) for st in self.states]):
-                if x2 > (x2old + threshold):
-                    x2_indices.append(i)
-                    x2old = x2
-            x2_indices.append(len(self.states))
-            # x2_indices now contains a list of indices with the same magnitudes
-            self.stars = []
-            xmin = 0
-            for xmax in x2_indices:
-                complist_stars = []  # for finding unique stars
-                symmstate_list = []  # list of sets corresponding to those stars...
-                for xi in range(xmin, xmax):
-                    x = self.states[xi]
-                    # is this a new rep. for a unique star?
-                    match = False
-                    for i, gs in enumerate(symmstate_list):
-                        if x in gs:
-                            # update star
-                            complist_stars[i].append(xi)
-                            match = True
-                            continue
-                    if not match:
-                        # new symmetry point!
-                        complist_stars.append([xi])
-                        symmstate_list.append(set([x.g(self.crys, self.chem, g) for g in self.crys.G]))
-                self.stars += complist_stars
-                xmin = xmax
+            # states in the same star share the same canonical key
+            self.stars = groupstars(self.canonicalkeys(self.states_ij, self.states_R))
         else:
             self.stars = [[]]
         self.Nstars = len(self.stars)
         # generate index: which star is each state a member of?
         self.index = np.zeros(self.Nstates, dtype=int)
-        self.indexdict = {}
         for si, star in enumerate(self.stars):
             for xi in star:
                 self.index[xi] = si
-                self.indexdict[self.states[xi]] = (xi, si)
+        self.statekeys = packstates(self.states_ij, self.states_R)
+        self.keyindex = {key: (xi, si) for xi, (key, si) in enumerate(zip(self.statekeys.tolist(),
+                                                                          self.index.tolist()))}
+        cache[cachekey] = (tuple(self.states), self.states_ij, self.states_R, self.states_dx,
+                           tuple(tuple(star) for star in self.stars), self.index, self.statekeys, self.keyindex)
+        self.installgenerate(*cache[cachekey])
+
+    def installgenerate(self, states, states_ij, states_R, states_dx, stars, index, statekeys, keyindex):
+        """
+        Set our states and stars from a (cached) result of generate; everything is copied, so
+        that later changes (e.g., __iadd__) leave the cached result untouched.
+        """
+        self.states = list(states)
+        self.Nstates = len(self.states)
+        self.states_ij, self.states_R, self.states_dx = states_ij.copy(), states_R.copy(), states_dx.copy()
+        self.stars = [list(star) for star in stars]
+        self.Nstars = len(self.stars)
+        self.index = index.copy()
+        self.statekeys = statekeys.copy()
+        self.keyindex = keyindex.copy()
 
     def addhdf5(self, HDF5group):
         """
@@ -432,6 +758,7 @@ class StarSet(object):
         SSet = cls(None, None, None)  # initialize
         SSet.crys = crys
         SSet.chem = HDF5group.attrs['chem']
+        SSet.gengrouptables()
         SSet.Nshells = HDF5group['Nshells'][()]
         SSet.jumplist = array2PSlist(HDF5group['jumplist_ij'][()],
                                      HDF5group['jumplist_R'][()],
@@ -439,35 +766,44 @@ class StarSet(object):
         SSet.jumpnetwork_index = [[] for n in range(HDF5group['jumplist_Nunique'][()])]
         for i, jump in enumerate(HDF5group['jumplist_invmap'][()]):
             SSet.jumpnetwork_index[jump].append(i)
-        SSet.states = array2PSlist(HDF5group['states_ij'][()],
-                                   HDF5group['states_R'][()],
-                                   HDF5group['states_dx'][()])
+        SSet.states_ij = HDF5group['states_ij'][()]
+        SSet.states_R = HDF5group['states_R'][()]
+        SSet.states_dx = HDF5group['states_dx'][()]
+        SSet.states = array2PSlist(SSet.states_ij, SSet.states_R, SSet.states_dx)
         SSet.Nstates = len(SSet.states)
         SSet.index = HDF5group['states_index'][()]
         # construct the states, and the index dictionary:
         SSet.Nstars = max(SSet.index) + 1
         SSet.stars = [[] for n in range(SSet.Nstars)]
-        SSet.indexdict = {}
         for xi, si in enumerate(SSet.index):
             SSet.stars[si].append(xi)
-            SSet.indexdict[SSet.states[xi]] = (xi, si)
+        SSet.statekeys = packstates(SSet.states_ij, SSet.states_R)
+        SSet.keyindex = {key: (xi, si) for xi, (key, si) in enumerate(zip(SSet.statekeys.tolist(),
+                                                                          SSet.index.tolist()))}
         return SSet
 
     def copy(self, empty=False):
         """Return a copy of the StarSet; done as efficiently as possible; empty means skip the shells, etc."""
         newStarSet = self.__class__(None, None, None)  # a little hacky... creates an empty class
-        newStarSet.jumpnetwork_index = copy.deepcopy(self.jumpnetwork_index)
+        # jumpnetwork_index and stars are lists of lists of ints, so copying each list is enough
+        newStarSet.jumpnetwork_index = [jlist[:] for jlist in self.jumpnetwork_index]
         newStarSet.jumplist = self.jumplist.copy()
         newStarSet.crys = self.crys
         newStarSet.chem = self.chem
+        newStarSet.G_rot, newStarSet.G_cartrot = self.G_rot, self.G_cartrot
+        newStarSet.G_perm, newStarSet.G_shift = self.G_perm, self.G_shift
         if not empty:
             newStarSet.Nshells = self.Nshells
-            newStarSet.stars = copy.deepcopy(self.stars)
+            newStarSet.stars = [star[:] for star in self.stars]
             newStarSet.states = self.states.copy()
+            newStarSet.states_ij = self.states_ij.copy()
+            newStarSet.states_R = self.states_R.copy()
+            newStarSet.states_dx = self.states_dx.copy()
             newStarSet.Nstars = self.Nstars
             newStarSet.Nstates = self.Nstates
             newStarSet.index = self.index.copy()
-            newStarSet.indexdict = self.indexdict.copy()
+            newStarSet.statekeys = self.statekeys.copy()
+            newStarSet.keyindex = self.keyindex.copy()
         else:
             newStarSet.generate(0)
         return newStarSet
@@ -488,98 +824,129 @@ class StarSet(object):
 
     def __iadd__(self, other):
         """Add another StarSet to this one; very similar to generate()"""
-        threshold = 1e-8
         if not isinstance(other, self.__class__): return NotImplemented
         if self.chem != other.chem: return ArithmeticError('Cannot add different chemistry index')
         if other.Nshells < 1: return self
         if self.Nshells < 1:
+            # we can share anything that is only ever replaced, never changed in place: the state
+            # arrays and keys, and the individual stars (we only append new stars to our list)
             self.Nshells = other.Nshells
-            self.stars = copy.deepcopy(other.stars)
+            self.stars = list(other.stars)
             self.states = other.states.copy()
+            self.states_ij = other.states_ij
+            self.states_R = other.states_R
+            self.states_dx = other.states_dx
             self.Nstars = other.Nstars
             self.Nstates = other.Nstates
             self.index = other.index.copy()
-            self.indexdict = other.indexdict.copy()
+            self.statekeys = other.statekeys
+            self.keyindex = other.keyindex.copy()
             return self
         self.Nshells += other.Nshells
         Nold = self.Nstates
-        oldstateset = set(self.states)
-        newstateset = set([])
-        for s1 in self.states[:Nold]:
-            for s2 in other.states:
-                # this try/except structure lets us attempt addition and kick out if not possible
-                try:
-                    s = s1 + s2
-                except:
-                    continue
-                if not s.iszero() and not s in oldstateset: newstateset.add(s)
+        ij, R, dx = composestates(self.states_ij, self.states_R, self.states_dx,
+                                  other.states_ij, other.states_R, other.states_dx)
+        nonzero = ~zerostates(ij, R)
+        ij, R, dx = ij[nonzero], R[nonzero], dx[nonzero]
+        # keep one of each new state, by their packed keys
+        keys, first = np.unique(packstates(ij, R), return_index=True)
+        new = ~np.isin(keys, self.statekeys)
+        ij, R = ij[first[new]], R[first[new]]
+        dx = statedx(self.crys, self.chem, ij, R)
         # now to sort our set of vectors (easiest by magnitude, and then reduce down:
-        self.states += sorted([s for s in newstateset], key=PairState.sortkey)
+        order = sortorder(dx, keys[new], self.crys.threshold)
+        newstates_ij, newstates_R, newstates_dx = ij[order], R[order], dx[order]
+        newstates = array2PSlist(newstates_ij, newstates_R, newstates_dx)
+        self.states += newstates
+        self.states_ij = np.concatenate((self.states_ij, newstates_ij))
+        self.states_R = np.concatenate((self.states_R, newstates_R))
+        self.states_dx = np.concatenate((self.states_dx, newstates_dx))
         Nnew = len(self.states)
-        x2_indices = []
-        x2old = np.dot(self.states[Nold].dx, self.states[Nold].dx)
-        for i in range(Nold, Nnew):
-            x2 = np.dot(self.states[i].dx, self.states[i].dx)
-            if x2 > (x2old + threshold):
-                x2_indices.append(i)
-                x2old = x2
-        x2_indices.append(Nnew)
-        # x2_indices now contains a list of indices with the same magnitudes
-        xmin = Nold
-        for xmax in x2_indices:
-            complist_stars = []  # for finding unique stars
-            symmstate_list = []  # list of sets corresponding to those stars...
-            for xi in range(xmin, xmax):
-                x = self.states[xi]
-                # is this a new rep. for a unique star?
-                match = False
-                for i, gs in enumerate(symmstate_list):
-                    if x in gs:
-                        # update star
-                        complist_stars[i].append(xi)
-                        match = True
-                        continue
-                if not match:
-                    # new symmetry point!
-                    complist_stars.append([xi])
-                    symmstate_list.append(set([x.g(self.crys, self.chem, g) for g in self.crys.G]))
-            self.stars += complist_stars
-            xmin = xmax
+        # our old states are closed under symmetry, so the new states only form new stars
+        if len(newstates) > 0:
+            self.stars += groupstars(self.canonicalkeys(newstates_ij, newstates_R), offset=Nold)
         self.Nstates = Nnew
         # generate new index entries: which star is each state a member of?
-        self.index = np.pad(self.index, (0, Nnew - Nold), mode='constant')
+        self.index = growarray(self.index, Nnew)
         Nold = self.Nstars
         Nnew = len(self.stars)
         for si in range(Nold, Nnew):
             star = self.stars[si]
             for xi in star:
                 self.index[xi] = si
-                self.indexdict[self.states[xi]] = (xi, si)
+        newkeys = packstates(newstates_ij, newstates_R)
+        for xi, key in enumerate(newkeys.tolist(), self.Nstates - len(newstates)):
+            self.keyindex[key] = (xi, int(self.index[xi]))
+        self.statekeys = np.concatenate((self.statekeys, newkeys))
         self.Nstars = Nnew
         return self
 
     def __contains__(self, PS):
         """Return true if PS is in the star"""
-        return PS in self.indexdict
+        return packstate(PS) in self.keyindex
 
     # replaces pointindex:
     def stateindex(self, PS):
         """Return the index of pair state PS; None if not found"""
         try:
-            return self.indexdict[PS][0]
+            return self.keyindex[packstate(PS)][0]
         except:
             return None
 
     def starindex(self, PS):
         """Return the index for the star to which pair state PS belongs; None if not found"""
         try:
-            return self.indexdict[PS][1]
+            return self.keyindex[packstate(PS)][1]
         except:
             return None
 
+    def stateindices(self, ij, R):
+        """
+        Vectorized stateindex: the index of each of a list of pair states (as arrays), found by
+        binary search of our sorted state keys.
+
+        :param ij: int_array[N][2] = (i,j)
+        :param R: int[N][3]
+        :return indices: int[N] of state indices; -1 if not found
+        """
+        # sorted keys are evaluated when needed; statekeys is replaced (never modified) when states change
+        sortcache = self.__dict__.get('sortedkeycache')
+        if sortcache is None or sortcache[0] is not self.statekeys:
+            order = np.argsort(self.statekeys)
+            sortcache = self.sortedkeycache = (self.statekeys, order, self.statekeys[order])
+        statekeys, order, sortedkeys = sortcache
+        indices = -np.ones(len(ij), dtype=int)
+        if len(sortedkeys) == 0: return indices
+        # states that cannot be packed cannot be ours
+        inrange = packable(ij, R)
+        keys = packstates(ij[inrange], R[inrange])
+        pos = np.searchsorted(sortedkeys, keys).clip(max=len(sortedkeys) - 1)
+        indices[inrange] = np.where(sortedkeys[pos] == keys, order[pos], -1)
+        return indices
+
     def symmatch(self, PS1, PS2):
         """True if there exists a group operation that makes PS1 == PS2."""
-        return any(PS1 == PS2.g(self.crys, self.chem, g) for g in self.crys.G)
+        return PS1 in self.orbitset(PS2)
+
+    def orbitset(self, PS, maxcache=1024):
+        """
+        Set of all states equivalent to PS by symmetry; cached, keeping the most recently used
+        maxcache orbits.
+
+        :param PS: pair state
+        :param maxcache: maximum number of orbits to keep in the cache
+        :return orbitset: frozenset of g*PS, over all group operations g
+        """
+        orbitcache = self.__dict__.setdefault('orbitcache', collections.OrderedDict())
+        try:
+            orbitcache.move_to_end(PS)
+            return orbitcache[PS]
+        except KeyError:
+            pass
+        gPSset = frozenset(self.orbit(PS))
+        orbitcache[PS] = gPSset
+        if len(orbitcache) > maxcache: orbitcache.popitem(last=False)
+        return gPSset
 
     # replaces DoubleStarSet
     def jumpnetwork_omega1(self):
@@ -599,22 +966,23 @@ class StarSet(object):
         jumpnetwork = []
         jumptype = []
         starpair = []
+        seen = set()  # all of the (i, f) pairs already in jumpnetwork
+        nonzero = ~zerostates(self.states_ij, self.states_R)
         for jt, jumpindices in enumerate(self.jumpnetwork_index):
             for jump in [self.jumplist[j] for j in jumpindices]:
-                for i, PSi in enumerate(self.states):
-                    if PSi.iszero(): continue
-                    # attempt to add...
-                    try:
-                        PSf = PSi + jump
-                    except:
-                        continue
-                    if PSf.iszero(): continue
-                    f = self.stateindex(PSf)
-                    if f is None: continue  # outside our StarSet
+                # add the jump to every (nonzero) state that it can be added to, all at once
+                ilist = np.flatnonzero(nonzero & (self.states_ij[:, 1] == jump.i))
+                fij = np.column_stack((self.states_ij[ilist, 0], np.full(len(ilist), jump.j)))
+                fR = self.states_R[ilist] + jump.R
+                # final states that are zero, or outside our StarSet, are -1
+                flist = np.where(zerostates(fij, fR), -1, self.stateindices(fij, fR))
+                for i, f in zip(ilist.tolist(), flist.tolist()):
+                    if f < 0: continue
                     # see if we've already generated this jump (works since all of our states are distinct)
-                    if any(any(i == i0 and f == f0 for (i0, f0), dx in jlist) for jlist in jumpnetwork): continue
-                    dx = PSf.dx - PSi.dx
+                    if (i, f) in seen: continue
+                    dx = jump.dx.copy()
                     jumpnetwork.append(self.symmequivjumplist(i, f, dx))
+                    seen.update(ij for ij, dx in jumpnetwork[-1])
                     jumptype.append(jt)
                     starpair.append((self.index[i], self.index[f]))
         return jumpnetwork, jumptype, starpair
@@ -636,23 +1004,27 @@ class StarSet(object):
         jumpnetwork = []
         jumptype = []
         starpair = []
+        seen = set()  # all of the (i, f) pairs already in jumpnetwork
+        negmap = self.negmap().tolist()
+        # the state where each jump takes the vacancy onto the solute: PSi + jump is zero, so PSi = -jump
+        ilist = []
+        if len(self.jumplist) > 0:
+            jump_ij, jump_R = PSlist2array(self.jumplist)[:2]
+            ilist = np.where(zerostates(jump_ij, jump_R), -1,
+                             self.stateindices(jump_ij[:, ::-1], -jump_R)).tolist()
         for jt, jumpindices in enumerate(self.jumpnetwork_index):
-            for jump in [self.jumplist[j] for j in jumpindices]:
-                for i, PSi in enumerate(self.states):
-                    if PSi.iszero(): continue
-                    # attempt to add...
-                    try:
-                        PSf = PSi + jump
-                    except:
-                        continue
-                    if not PSf.iszero(): continue
-                    f = self.stateindex(-PSi)  # exchange
-                    # see if we've already generated this jump (works since all of our states are distinct)
-                    if any(any(i == i0 and f == f0 for (i0, f0), dx in jlist) for jlist in jumpnetwork): continue
-                    dx = -PSi.dx  # the vacancy jumps into the solute position (exchange)
-                    jumpnetwork.append(self.symmequivjumplist(i, f, dx))
-                    jumptype.append(jt)
-                    starpair.append((self.index[i], self.index[f]))
+            for i in [ilist[j] for j in jumpindices]:
+                if i < 0: continue
+                # exchange: final state is -PSi
+                f = negmap[i]
+                if f < 0: continue
+                # see if we've already generated this jump (works since all of our states are distinct)
+                if (i, f) in seen: continue
+                dx = -self.states_dx[i]  # the vacancy jumps into the solute position (exchange)
+                jumpnetwork.append(self.symmequivjumplist(i, f, dx))
+                seen.update(ij for ij, dx in jumpnetwork[-1])
+                jumptype.append(jt)
+                starpair.append((self.index[i], self.index[f]))
         return jumpnetwork, jumptype, starpair
 
     def symmequivjumplist(self, i, f, dx):
@@ -664,17 +1036,15 @@ class StarSet(object):
         :param dx: displacement vector
         :return symmjumplist: list of tuples of ((gi, gf), gdx) for every group op
         """
-        PSi = self.states[i]
-        PSf = self.states[f]
+        Gmap = self.groupmap()
         symmjumplist = [((i, f), dx)]
         if i != f: symmjumplist.append(((f, i), -dx))  # i should not equal f... but in case we allow 0 as a jump
-        for g in self.crys.G:
-            gi, gf, gdx = self.stateindex(PSi.g(self.crys, self.chem, g)), \
-                          self.stateindex(PSf.g(self.crys, self.chem, g)), \
-                          self.crys.g_direc(g, dx)
-            if not any(gi == i0 and gf == f0 for (i0, f0), dx in symmjumplist):
+        seen = {(i, f), (f, i)}  # all of the (i, f) pairs already in symmjumplist
+        for gi, gf, gdx in zip(Gmap[:, i].tolist(), Gmap[:, f].tolist(), np.dot(self.G_cartrot, dx)):
+            if (gi, gf) not in seen:
                 symmjumplist.append(((gi, gf), gdx))
                 if gi != gf: symmjumplist.append(((gf, gi), -gdx))
+                seen.update(((gi, gf), (gf, gi)))
         return symmjumplist
 
     def diffgenerate(self, S1, S2, threshold=1e-8):
@@ -688,59 +1058,32 @@ class StarSet(object):
         """
         if S1.Nshells < 1 or S2.Nshells < 1: raise ValueError('Need to initialize stars')
         self.Nshells = S1.Nshells + S2.Nshells  # an estimate...
-        stateset = set([])
-        # self.states = []
-        for s1 in S1.states:
-            for s2 in S2.states:
-                # this try/except structure lets us attempt addition and kick out if not possible
-                try:
-                    s = s2 ^ s1  # points from vacancy state of s1 to vacancy state of s2
-                except:
-                    continue
-                stateset.add(s)
+        # s2 ^ s1 == (-s1) + s2 points from vacancy state of s1 to vacancy state of s2
+        ij, R, dx = composestates(S1.states_ij[:, ::-1], -S1.states_R, -S1.states_dx,
+                                  S2.states_ij, S2.states_R, S2.states_dx)
+        # remove duplicates by their packed keys
+        keys, first = np.unique(packstates(ij, R), return_index=True)
+        ij, R = ij[first], R[first]
+        dx = statedx(self.crys, self.chem, ij, R)
         # now to sort our set of vectors (easiest by magnitude, and then reduce down:
-        self.states = sorted([s for s in stateset], key=PairState.sortkey)
+        order = sortorder(dx, keys, threshold)
+        self.states_ij, self.states_R, self.states_dx = ij[order], R[order], dx[order]
+        self.states = array2PSlist(self.states_ij, self.states_R, self.states_dx)
         self.Nstates = len(self.states)
         if self.Nstates > 0:
-            x2_indices = []
-            x2old = np.dot(self.states[0].dx, self.states[0].dx)
-            for i, x2 in enumerate([np.dot(st.dx, st.dx) for st in self.states]):
-                if x2 > (x2old + threshold):
-                    x2_indices.append(i)
-                    x2old = x2
-            x2_indices.append(len(self.states))
-            # x2_indices now contains a list of indices with the same magnitudes
-            self.stars = []
-            xmin = 0
-            for xmax in x2_indices:
-                complist_stars = []  # for finding unique stars
-                symmstate_list = []  # list of sets corresponding to those stars...
-                for xi in range(xmin, xmax):
-                    x = self.states[xi]
-                    # is this a new rep. for a unique star?
-                    match = False
-                    for i, gs in enumerate(symmstate_list):
-                        if x in gs:
-                            # update star
-                            complist_stars[i].append(xi)
-                            match = True
-                            continue
-                    if not match:
-                        # new symmetry point!
-                        complist_stars.append([xi])
-                        symmstate_list.append(set([x.g(self.crys, self.chem, g) for g in self.crys.G]))
-                self.stars += complist_stars
-                xmin = xmax
+            # states in the same star share the same canonical key
+            self.stars = groupstars(self.canonicalkeys(self.states_ij, self.states_R))
         else:
             self.stars = [[]]
         self.Nstars = len(self.stars)
         # generate index: which star is each state a member of?
         self.index = np.zeros(self.Nstates, dtype=int)
-        self.indexdict = {}
         for si, star in enumerate(self.stars):
             for xi in star:
                 self.index[xi] = si
-                self.indexdict[self.states[xi]] = (xi, si)
+        self.statekeys = packstates(self.states_ij, self.states_R)
+        self.keyindex = {key: (xi, si) for xi, (key, si) in enumerate(zip(self.statekeys.tolist(),
+                                                                          self.index.tolist()))}
 
 
 def zeroclean(x, threshold=1e-8):
@@ -756,6 +1099,9 @@ class VectorStarSet(object):
 
     All based on a StarSet
     """
+    # orthonormal vectors of the VectorBasis of each site, for each crystal: {(chem, i): vlist}
+    # held weakly, so that entries go away with their crystal
+    sitevectcache = weakref.WeakKeyDictionary()
 
     def __init__(self, starset=None):
         """
@@ -766,8 +1112,10 @@ class VectorStarSet(object):
         # vecpos: list of "positions" (state indices) for each vector star (list of lists)
         # vecvec: list of vectors for each vector star (list of lists of vectors)
         # Nvstars: number of vector stars
+        # starsetkeys: statekeys of starset when we were generated (replaced whenever its states change)
 
         self.starset = None
+        self.starsetkeys = None
         self.Nvstars = 0
         if starset is not None:
             if starset.Nshells > 0:
@@ -780,36 +1128,43 @@ class VectorStarSet(object):
         :param starset: StarSet, from which we pull nearly all of the info that we need
         """
         if starset.Nshells == 0: return
-        if starset == self.starset: return
+        if starset is self.starset and starset.statekeys is self.starsetkeys: return
         self.starset = starset
+        self.starsetkeys = starset.statekeys
         dim = starset.crys.dim
         self.vecpos = []
         self.vecvec = []
         states = starset.states
+        Gmap = starset.groupmap()
+        origin = zerostates(starset.states_ij, starset.states_R).tolist()
+        sitevect = self.sitevectcache.setdefault(starset.crys, {})
         for s in starset.stars:
             # start by generating the parallel star-vector; always trivially present:
             PS0 = states[s[0]]
-            if PS0.iszero():
+            gxlist = Gmap[:, s[0]].tolist()  # index of g*PS0 for each g in crys.G
+            # index of the first group operation that maps PS0 onto each state in the star
+            gindex = {}
+            for gi, gx in enumerate(gxlist):
+                gindex.setdefault(gx, gi)
+            glist = [gindex[si] for si in s]
+            if origin[s[0]]:
                 # origin state; we can easily generate our vlist
-                vlist = starset.crys.vectlist(starset.crys.VectorBasis((self.starset.chem, PS0.i)))
+                sitekey = (starset.chem, PS0.i)
+                if sitekey not in sitevect:
+                    sitevect[sitekey] = starset.crys.vectlist(starset.crys.VectorBasis(sitekey))
+                vlist = sitevect[sitekey]
                 scale = 1. / np.sqrt(len(s))  # normalization factor; vectors are already normalized
                 vlist = [v * scale for v in vlist]
                 # add the positions
                 for v in vlist:
                     self.vecpos.append(s.copy())
-                    veclist = []
-                    for PSi in [states[si] for si in s]:
-                        for g in starset.crys.G:
-                            if PS0.g(starset.crys, starset.chem, g) == PSi:
-                                veclist.append(starset.crys.g_direc(g, v))
-                                break
-                    self.vecvec.append(veclist)
+                    self.vecvec.append(list(np.dot(starset.G_cartrot[glist], v)))
             else:
                 # not an origin state
-                vpara = PS0.dx
+                vpara = starset.states_dx[s[0]]
                 scale = 1. / np.sqrt(len(s) * np.dot(vpara, vpara))  # normalization factor
                 self.vecpos.append(s.copy())
-                self.vecvec.append([states[si].dx * scale for si in s])
+                self.vecvec.append(list(starset.states_dx[s] * scale))
                 # next, try to generate perpendicular star-vectors, if present:
                 if dim == 3:
                     v0 = np.cross(vpara, np.array([0, 0, 1.]))
@@ -826,10 +1181,10 @@ class VectorStarSet(object):
                     v0 /= np.sqrt(np.dot(v0, v0))
                     Nvect = 1
                 # run over the invariant group operations for state PS0
-                for g in self.starset.crys.G:
+                for gcart, gx in zip(starset.G_cartrot, gxlist):
                     if Nvect == 0: continue
-                    if PS0 != PS0.g(starset.crys, starset.chem, g): continue
-                    gv0 = starset.crys.g_direc(g, v0)
+                    if gx != s[0]: continue
+                    gv0 = np.dot(gcart, v0)
                     if Nvect == 1:
                         # we only need to check that we still have an invariant vector
                         if not np.isclose(np.dot(v0, v0), 1): raise ArithmeticError('Somehow got unnormalized vector?')
@@ -837,7 +1192,7 @@ class VectorStarSet(object):
                     if Nvect == 2:
                         if not np.isclose(np.dot(v0, v0), 1): raise ArithmeticError('Somehow got unnormalized vector?')
                         if not np.isclose(np.dot(v1, v1), 1): raise ArithmeticError('Somehow got unnormalized vector?')
-                        gv1 = starset.crys.g_direc(g, v1)
+                        gv1 = np.dot(gcart, v1)
                         g00 = np.dot(v0, gv0)
                         g11 = np.dot(v1, gv1)
                         g01 = np.dot(v0, gv1)
@@ -867,13 +1222,7 @@ class VectorStarSet(object):
                     # add the positions
                     for v in vlist:
                         self.vecpos.append(s.copy())
-                        veclist = []
-                        for PSi in [states[si] for si in s]:
-                            for g in starset.crys.G:
-                                if PS0.g(starset.crys, starset.chem, g) == PSi:
-                                    veclist.append(starset.crys.g_direc(g, v))
-                                    break
-                        self.vecvec.append(veclist)
+                        self.vecvec.append(list(np.dot(starset.G_cartrot[glist], v)))
         self.Nvstars = len(self.vecpos)
         self.outer = self.generateouter()
 
@@ -887,12 +1236,53 @@ class VectorStarSet(object):
         # dim = len(self.vecvec[0][0])
         dim = self.starset.crys.dim
         outer = np.zeros((dim, dim, self.Nvstars, self.Nvstars))
-        for i, sR0, sv0 in zip(itertools.count(), self.vecpos, self.vecvec):
-            for j, sR1, sv1 in zip(itertools.count(), self.vecpos, self.vecvec):
-                if sR0[0] == sR1[0]:
-                    outer[:, :, i, j] = sum([np.outer(v0, v1) for v0, v1 in zip(sv0, sv1)])
+        # only vector stars on the same star (same first state, hence the same states) overlap:
+        # group them, and then do all of the outer products for each group at once
+        groups = collections.defaultdict(list)
+        for i, sR in enumerate(self.vecpos):
+            groups[sR[0]].append(i)
+        for ilist in groups.values():
+            v = np.array([self.vecvec[i] for i in ilist])  # [Ngroup][Nstates][dim]
+            outer[:, :, np.array(ilist)[:, np.newaxis], ilist] = np.einsum('imk,jml->klij', v, v)
         return zeroclean(outer)
 
+    def statevectors(self):
+        """
+        Index our vector stars by state: for each state in the starset, the vector stars that include
+        it, and the vector of each on that state. Evaluated when needed, and kept until we are regenerated.
+
+        :return vstars: list of int arrays; vstars[xi] are the indices of the vector stars including state xi
+        :return vectors: list of float[n][3] arrays; vectors[xi][n] is the vector of vector star vstars[xi][n]
+        """
+        svcache = self.__dict__.get('statevectorcache')
+        if svcache is None or svcache[0] is not self.vecpos:
+            dim, Nstates = self.starset.crys.dim, self.starset.Nstates
+            pos = np.array([xi for Rs in self.vecpos for xi in Rs], dtype=int)
+            vstar = np.repeat(np.arange(self.Nvstars), [len(Rs) for Rs in self.vecpos])
+            vec = np.array([v for vs in self.vecvec for v in vs]).reshape(-1, dim)
+            order = np.argsort(pos, kind='stable')
+            splits = np.searchsorted(pos[order], np.arange(1, Nstates))
+            svcache = self.statevectorcache = (self.vecpos, np.split(vstar[order], splits),
+                                               np.split(vec[order], splits))
+        return svcache[1], svcache[2]
+
+    def jumparrays(self, jumpnetwork):
+        """
+        Flatten a jumpnetwork into arrays over all of its jumps. Evaluated on each call, as the
+        lists in a jumpnetwork can be changed in place (e.g., pruned) between expansions.
+
+        :param jumpnetwork: list of lists of (IS, FS), dx tuples, where IS and FS index our states
+        :return IS: int[M] of initial state indices
+        :return FS: int[M] of final state indices
+        :return DX: float[M][dim] of displacements
+        :return jumpk: int[M] of the index of the list in jumpnetwork containing each jump
+        """
+        dim = self.starset.crys.dim
+        ISFS = np.array([ISFS for jumplist in jumpnetwork for ISFS, dx in jumplist], dtype=int).reshape(-1, 2)
+        DX = np.array([dx for jumplist in jumpnetwork for ISFS, dx in jumplist], dtype=float).reshape(-1, dim)
+        jumpk = np.repeat(np.arange(len(jumpnetwork)), [len(jumplist) for jumplist in jumpnetwork])
+        return ISFS[:, 0], ISFS[:, 1], DX, jumpk
+
     def addhdf5(self, HDF5group):
         """
         Adds an HDF5 representation of object into an HDF5group (needs to already exist).
@@ -920,6 +1310,7 @@ class VectorStarSet(object):
         """
         VSSet = cls(None)  # initialize
         VSSet.starset = SSet
+        VSSet.starsetkeys = SSet.statekeys
         VSSet.Nvstars = HDF5group['Nvstars'][()]
         VSSet.vecpos = flatlistindex2doublelist(HDF5group['vecposlist'][()],
                                                 HDF5group['vecposindex'][()])
@@ -942,21 +1333,30 @@ class VectorStarSet(object):
         GFstarset = self.starset.copy(empty=True)
         GFstarset.diffgenerate(self.starset, self.starset)
         GFexpansion = np.zeros((self.Nvstars, self.Nvstars, GFstarset.Nstars))
-        for i in range(self.Nvstars):
-            for si, vi in zip(self.vecpos[i], self.vecvec[i]):
-                for j in range(i, self.Nvstars):
-                    for sj, vj in zip(self.vecpos[j], self.vecvec[j]):
-                        try:
-                            ds = self.starset.states[sj] ^ self.starset.states[si]
-                        except:
-                            continue
-                        k = GFstarset.starindex(ds)
-                        if k is None: raise ArithmeticError('GF star not large enough to include {}?'.format(ds))
-                        GFexpansion[i, j, k] += np.dot(vi, vj)
+        # flattened (vector star, state, vector) entries of all of our vector stars
+        vstars, vectors = self.statevectors()
+        evstar, evec = np.concatenate(vstars), np.concatenate(vectors)
+        estate = np.repeat(np.arange(len(vstars)), [len(ilist) for ilist in vstars])
+        ij, R = self.starset.states_ij, self.starset.states_R
+        estate_i = ij[estate, 0]
+        for si, (ilist, vi) in enumerate(zip(vstars, vectors)):
+            if len(ilist) == 0: continue
+            # entries (j, sj) with j >= i for some vector star i on si, and where states[sj] ^ states[si] exists
+            E = np.flatnonzero((estate_i == ij[si, 0]) & (evstar >= ilist.min()))
+            sjlist = estate[E]
+            # endpoint subtraction: (i,j) R ^ (i,k) R' = (k,j) R-R'
+            dsindex = GFstarset.stateindices(np.column_stack((np.full(len(E), ij[si, 1]), ij[sjlist, 1])),
+                                             R[sjlist] - R[si])
+            if np.any(dsindex < 0):
+                ds = self.starset.states[sjlist[np.argmax(dsindex < 0)]] ^ self.starset.states[si]
+                raise ArithmeticError('GF star not large enough to include {}?'.format(ds))
+            I, J = np.meshgrid(ilist, evstar[E], indexing='ij')
+            K = np.broadcast_to(GFstarset.index[dsindex], I.shape)
+            upper = J >= I
+            np.add.at(GFexpansion, (I[upper], J[upper], K[upper]), np.dot(vi, evec[E].T)[upper])
         # symmetrize
-        for i in range(self.Nvstars):
-            for j in range(0, i):
-                GFexpansion[i, j, :] = GFexpansion[j, i, :]
+        lower = np.tril_indices(self.Nvstars, k=-1)
+        GFexpansion[lower] = GFexpansion[lower[::-1]]
         # cleanup on return:
         return zeroclean(GFexpansion), GFstarset
 
@@ -994,35 +1394,34 @@ class VectorStarSet(object):
         rate1expansion = np.zeros((self.Nvstars, self.Nvstars, len(jumpnetwork)))
         rate0escape = np.zeros((self.Nvstars, len(self.starset.jumpnetwork_index)))
         rate1escape = np.zeros((self.Nvstars, len(jumpnetwork)))
-        for k, jumplist, jt in zip(itertools.count(), jumpnetwork, jumptype):
+        # the vector stars (i) with their vectors (vi) on each state
+        vstars, vectors = self.statevectors()
+        for k, (jumplist, jt) in enumerate(zip(jumpnetwork, jumptype)):
             for (IS, FS), dx in jumplist:
-                for i in range(self.Nvstars):
-                    for Ri, vi in zip(self.vecpos[i], self.vecvec[i]):
-                        if Ri == IS:
-                            rate0escape[i, jt] -= np.dot(vi, vi)
-                            rate1escape[i, k] -= np.dot(vi, vi)
-                            # for j in range(i+1):
-                            for j in range(self.Nvstars):
-                                for Rj, vj in zip(self.vecpos[j], self.vecvec[j]):
-                                    if Rj == FS:
-                                        if not omega2: rate0expansion[i, j, jt] += np.dot(vi, vj)
-                                        rate1expansion[i, j, k] += np.dot(vi, vj)
-                            if omega2:
-                                # find the "origin state" corresponding to the solute; "remove" those rates
-                                OSindex = self.starset.stateindex(PairState.zero(self.starset.states[IS].i,
-                                                                                 self.starset.crys.dim))
-                                if OSindex is not None:
-                                    for j in range(self.Nvstars):
-                                        for Rj, vj in zip(self.vecpos[j], self.vecvec[j]):
-                                            if Rj == OSindex:
-                                                rate0expansion[i, j, jt] += np.dot(vi, vj)
-                                                rate0expansion[j, i, jt] += np.dot(vi, vj)
-                                                rate0escape[j, jt] -= np.dot(vj, vj)
+                ilist, vi = vstars[IS], vectors[IS]
+                if len(ilist) == 0: continue
+                vi2 = np.einsum('ij,ij->i', vi, vi)
+                rate0escape[ilist, jt] -= vi2
+                rate1escape[ilist, k] -= vi2
+                jlist, vj = vstars[FS], vectors[FS]
+                vivj = np.dot(vi, vj.T)
+                if not omega2: rate0expansion[ilist[:, np.newaxis], jlist, jt] += vivj
+                rate1expansion[ilist[:, np.newaxis], jlist, k] += vivj
+                if omega2:
+                    # find the "origin state" corresponding to the solute; "remove" those rates
+                    OSindex = self.starset.stateindex(PairState.zero(self.starset.states[IS].i,
+                                                                     self.starset.crys.dim))
+                    if OSindex is not None:
+                        jlist, vj = vstars[OSindex], vectors[OSindex]
+                        vivj = np.dot(vi, vj.T)
+                        rate0expansion[ilist[:, np.newaxis], jlist, jt] += vivj
+                        rate0expansion[jlist[:, np.newaxis], ilist, jt] += vivj.T
+                        rate0escape[jlist, jt] -= len(ilist) * np.einsum('ij,ij->i', vj, vj)
         # cleanup on return
         return zeroclean(rate0expansion), zeroclean(rate0escape), \
                zeroclean(rate1expansion), zeroclean(rate1escape)
 
-    def biasexpansions(self, jumpnetwork, jumptype, omega2=False):
+    def biasexpansions(self, jumpnetwork, jumptype, omega2=False, dtype=np.float64):
         """
         Construct the bias1 and bias0 vector expansion in terms of the jumpnetwork.
         We return the bias0 contribution so that the db = bias1 - bias0 can be determined.
@@ -1043,41 +1442,57 @@ class VectorStarSet(object):
         :param jumptype: specific omega0 jump type that the jump corresponds to
         :param omega2: (optional) are we dealing with the omega2 list, so we need to remove
             origin states? (default=False)
+        :param dtype: (optional) float type of the expansions; np.float32 halves their memory,
+            at the cost of precision (default=np.float64)
         :return bias0expansion: array[Nsv, Njump_omega0]
             the gen0 vector[i] = sum(bias0expasion[i, k] * sqrt(probfactor0[PS[k]]) * omega0[k])
         :return bias1expansion: array[Nsv, Njump_omega1]
             the gen1 vector[i] = sum(bias1expansion[i, k] * sqrt(probfactor[PS[k]] * omega1[k])
         """
         if self.Nvstars == 0: return None
-        bias0expansion = np.zeros((self.Nvstars, len(self.starset.jumpnetwork_index)))
-        bias1expansion = np.zeros((self.Nvstars, len(jumpnetwork)))
-
-        for k, jumplist, jt in zip(itertools.count(), jumpnetwork, jumptype):
-            for (IS, FS), dx in jumplist:
-                # run through the star-vectors; just use first as representative
-                for i, svR, svv in zip(itertools.count(), self.vecpos, self.vecvec):
-                    if svR[0] == IS:
-                        geom_bias = np.dot(svv[0], dx) * len(svR)
-                        bias1expansion[i, k] += geom_bias
-                        bias0expansion[i, jt] += geom_bias
-                if omega2:
-                    # find the "origin state" corresponding to the solute; incorporate the change in bias
-                    OSindex = self.starset.stateindex(PairState.zero(self.starset.states[IS].i,
-                                                                     self.starset.crys.dim))
-                    if OSindex is not None:
-                        for j in range(self.Nvstars):
-                            for Rj, vj in zip(self.vecpos[j], self.vecvec[j]):
-                                if Rj == OSindex:
-                                    geom_bias = -np.dot(vj, dx)
-                                    bias1expansion[j, k] += geom_bias  # do we need this??
-                                    bias0expansion[j, jt] += geom_bias
+        bias0expansion = np.zeros((self.Nvstars, len(self.starset.jumpnetwork_index)), dtype=dtype)
+        bias1expansion = np.zeros((self.Nvstars, len(jumpnetwork)), dtype=dtype)
+        dim = self.starset.crys.dim
+        # representative (first) state, vector, and multiplicity of each star-vector
+        svrep = np.array([svR[0] for svR in self.vecpos], dtype=int)
+        svv0 = np.array([svv[0] for svv in self.vecvec], dtype=dtype).reshape(-1, dim)
+        svlen = np.array([len(svR) for svR in self.vecpos], dtype=int)
+        # initial state, displacement, jump index k and jump type of every jump in the network
+        jumpIS, jumpFS, DX, jumpk = self.jumparrays(jumpnetwork)
+        DX = DX.astype(dtype, copy=False)
+        jumpjt = np.array(jumptype, dtype=int)[jumpk]
+        # every (jump, star-vector) where the initial state is the representative of the star-vector,
+        # found by binary search in the sorted representatives (a few star-vectors can share one)
+        svorder = np.argsort(svrep, kind='stable')
+        lo = np.searchsorted(svrep[svorder], jumpIS, side='left')
+        counts = np.searchsorted(svrep[svorder], jumpIS, side='right') - lo
+        m = np.repeat(np.arange(len(jumpIS)), counts)
+        i = svorder[np.repeat(lo, counts) + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)]
+        geom_bias = np.einsum('ij,ij->i', svv0[i], DX[m]) * svlen[i]
+        np.add.at(bias1expansion, (i, jumpk[m]), geom_bias)
+        np.add.at(bias0expansion, (i, jumpjt[m]), geom_bias)
+        if omega2:
+            # find the "origin state" corresponding to the solute; incorporate the change in bias
+            vstars, vectors = self.statevectors()
+            sites = self.starset.states_ij[jumpIS, 0]
+            OSlist = self.starset.stateindices(np.column_stack((sites, sites)),
+                                               np.zeros((len(jumpIS), dim), dtype=int))
+            # (jump, vector star, vector) entries for the vector stars on the origin state of each jump
+            mOS = np.flatnonzero(OSlist >= 0)
+            if len(mOS) > 0:
+                m = np.repeat(mOS, [len(vstars[OS]) for OS in OSlist[mOS].tolist()])
+                ev = np.concatenate([vstars[OS] for OS in OSlist[mOS].tolist()])
+                evec = np.concatenate([vectors[OS] for OS in OSlist[mOS].tolist()])
+                geom_bias = -np.einsum('ij,ij->i', evec, DX[m])
+                np.add.at(bias1expansion, (ev, jumpk[m]), geom_bias)  # do we need this??
+                np.add.at(bias0expansion, (ev, jumpjt[m]), geom_bias)
 
         # cleanup on return
         return zeroclean(bias0expansion), zeroclean(bias1expansion)
 
     # this is *almost* a static method--it only need to know how many omega0 type jumps there are
     # in the starset. We *could* make it static and use max(jumptype), but that may not be strictly safe
-    def bareexpansions(self, jumpnetwork, jumptype):
+    def bareexpansions(self, jumpnetwork, jumptype, dtype=np.float64):
         """
         Construct the bare diffusivity expansion in terms of the jumpnetwork.
         We return the reference (0) contribution so that the change can be determined; this
@@ -1095,6 +1510,8 @@ class VectorStarSet(object):
             corresponding to our starset. List of lists of (IS, FS), dx tuples, where IS and FS
             are indices corresponding to states in our starset.
         :param jumptype: specific omega0 jump type that the jump corresponds to
+        :param dtype: (optional) float type of the expansions; np.float32 halves their memory,
+            at the cost of precision (default=np.float64)
         :return D0expansion: array[3,3, Njump_omega0]
             the D0[a,b,jt] = sum(D0expansion[a,b, jt] * sqrt(probfactor0[PS[jt][0]]*probfactor0[PS[jt][1]) * omega0[jt])
         :return D1expansion: array[3,3, Njump_omega1]
@@ -1103,14 +1520,15 @@ class VectorStarSet(object):
         if self.Nvstars == 0: return None
         # dim = len(jumpnetwork[0][0][1])
         dim = self.starset.crys.dim
-        D0expansion = np.zeros((dim, dim, len(self.starset.jumpnetwork_index)))
-        D1expansion = np.zeros((dim, dim, len(jumpnetwork)))
-        for k, jt, jumplist in zip(itertools.count(), jumptype, jumpnetwork):
-            d0 = sum(0.5 * np.outer(dx, dx) for ISFS, dx in jumplist)  # we don't need initial/final state
-            D0expansion[:, :, jt] += d0
-            D1expansion[:, :, k] += d0
+        D0expansion = np.zeros((len(self.starset.jumpnetwork_index), dim, dim), dtype=dtype)
+        D1expansion = np.zeros((len(jumpnetwork), dim, dim), dtype=dtype)
+        # the displacements of every jump; we don't need initial/final state
+        DX, jumpk = self.jumparrays(jumpnetwork)[2:]
+        DX = DX.astype(dtype, copy=False)
+        np.add.at(D1expansion, jumpk, 0.5 * np.einsum('mi,mj->mij', DX, DX))
+        np.add.at(D0expansion, np.array(jumptype, dtype=int), D1expansion)
         # cleanup on return
-        return zeroclean(D0expansion), zeroclean(D1expansion)
+        return zeroclean(np.moveaxis(D0expansion, 0, -1).copy()), zeroclean(np.moveaxis(D1expansion, 0, -1).copy())
 
     def originstateVectorBasisfolddown(self, elemtype='solute'):
         """
@@ -1121,9 +1539,12 @@ class VectorStarSet(object):
         :return folddown: [NOS, Nvstars] to map vector stars to origin states
         :return OS_VB: [NOS, Nsites, 3] mapping of origin state to a vector basis
         """
-        attr = {'solute': 'i', 'vacancy': 'j'}.get(elemtype)
-        if attr is None: raise ValueError('elemtype needs to be "solute" or "vacancy" not {}'.format(elemtype))
-        OSindices = [n for n in range(self.Nvstars) if self.starset.states[self.vecpos[n][0]].iszero()]
+        # the column of states_ij with the site we reduce to: i for solute, j for vacancy
+        col = {'solute': 0, 'vacancy': 1}.get(elemtype)
+        if col is None: raise ValueError('elemtype needs to be "solute" or "vacancy" not {}'.format(elemtype))
+        sites = self.starset.states_ij[:, col]
+        origin = zerostates(self.starset.states_ij, self.starset.states_R)
+        OSindices = [n for n in range(self.Nvstars) if origin[self.vecpos[n][0]]]
         NOS, Nsites = len(OSindices), len(self.starset.crys.basis[self.starset.chem])
         folddown = np.zeros((NOS, self.Nvstars))
         # dim = len(self.vecvec[0][0])
@@ -1131,14 +1552,21 @@ class VectorStarSet(object):
         OS_VB = np.zeros((NOS, Nsites, dim))
         if NOS==0:
             return OSindices, folddown, OS_VB
-        for i, ni in enumerate(OSindices):
-            for OS, OSv in zip(self.vecpos[ni], self.vecvec[ni]):
-                index = getattr(self.starset.states[OS], attr)
-                OS_VB[i, index, :] = OSv[:]
-                for j, svR, svv in zip(itertools.count(), self.vecpos, self.vecvec):
-                    for s, v in zip(svR, svv):
-                        if getattr(self.starset.states[s], attr) == index:
-                            folddown[i, j] += np.dot(OSv, v)
+        # sum of the vectors of each vector star on the states with each site: sitevec[site, j]
+        flat_j = np.repeat(np.arange(self.Nvstars), [len(svR) for svR in self.vecpos])
+        flat_site = sites[np.concatenate(self.vecpos)]
+        flat_v = np.array([v for svv in self.vecvec for v in svv]).reshape(-1, dim)
+        sitevec = np.zeros((Nsites, self.Nvstars, dim))
+        np.add.at(sitevec, (flat_site, flat_j), flat_v)
+        # (origin state, site, vector) entries of the origin-state vector stars
+        OS_i = np.repeat(np.arange(NOS), [len(self.vecpos[ni]) for ni in OSindices])
+        OS_site = sites[np.concatenate([self.vecpos[ni] for ni in OSindices])]
+        OS_v = np.array([v for ni in OSindices for v in self.vecvec[ni]]).reshape(-1, dim)
+        OS_VB[OS_i, OS_site, :] = OS_v
+        # sum the origin-state vectors on each site first, then contract over sites and vectors at once
+        OSsitevec = np.zeros((NOS, Nsites, dim))
+        np.add.at(OSsitevec, (OS_i, OS_site), OS_v)
+        folddown += np.einsum('isd,sjd->ij', OSsitevec, sitevec, optimize=True)
         # cleanup on return
         return OSindices, zeroclean(folddown), zeroclean(OS_VB)
 
@@ -1222,6 +1650,18 @@ class DBStarSet(object):
                                      self.crys.basis[self.chem][self.pdbcontainer.iorlist[entry.db.iorind][0]])
         return np.dot(db_pos - sol_pos, db_pos - sol_pos)
 
+    def _sortkeys(self, statelist):
+        """Vectorized _sortkey: the squared solute-dumbbell separation for each state in a list"""
+        dim = self.crys.dim
+        basis = np.array(self.crys.basis[self.chem]).reshape(-1, dim)
+        dbsite = np.array([site for site, o in self.pdbcontainer.iorlist], dtype=int)
+        i_s = np.array([st.i_s for st in statelist], dtype=int)
+        R_s = np.array([st.R_s for st in statelist]).reshape(-1, dim)
+        iorind = np.array([st.db.iorind for st in statelist], dtype=int)
+        R_db = np.array([st.db.R for st in statelist]).reshape(-1, dim)
+        dx = np.dot(R_db + basis[dbsite[iorind]] - R_s - basis[i_s], self.crys.lattice.T)
+        return np.einsum('ij,ij->i', dx, dx)
+
     def genIndextoContainer(self, complexStates, mixedstates):
         pureDict = {}
         mixedDict = {}
@@ -1252,7 +1692,7 @@ class DBStarSet(object):
             # We won't put in origin states just yet.
             for j in self.jumplist:
                 dx = DB_disp(self.pdbcontainer, j.state1, j.state2)
-                if np.allclose(dx, np.zeros(self.crys.dim, dtype=int), atol=self.pdbcontainer.crys.threshold):
+                if np.allclose(dx, 0, atol=self.pdbcontainer.crys.threshold):
                     continue
                 # Now go through the all the dumbbell states in the (i,or) list:
                 for idx, (i, o) in enumerate(self.pdbcontainer.iorlist):
@@ -1267,57 +1707,72 @@ class DBStarSet(object):
                 pair = SdPair(tup[0], np.zeros(self.crys.dim, dtype=int), dumbbell(ind, np.zeros(self.crys.dim, dtype=int)))
                 stateset.add(pair)
         print("built shell {}: time - {}".format(1, time.time() - start))
-        lastshell = stateset.copy()
+        # local names for everything used inside of the shell loops
+        iorlist, dim = self.pdbcontainer.iorlist, self.crys.dim
+        # the shells are held as int arrays of rows (i_s, iorind, R of dumbbell), with the solute at the origin
+        if Nshells > 1 and any(not np.allclose(pair.R_s, 0, atol=self.crys.threshold) for pair in stateset):
+            raise ValueError("The solute is not at the origin in a complex state")
+        lastshell = np.array([(pair.i_s, pair.db.iorind) + tuple(pair.db.R) for pair in stateset],
+                             dtype=int).reshape(-1, 2 + dim)
+        shells = [lastshell]
+        # (i,o) indices grouped by site, so that we can produce every orientation at a dumbbell site at once
+        iorsites = np.array([site for site, o in iorlist], dtype=int)
+        siteorder = np.argsort(iorsites, kind='stable')
+        sitestart = np.searchsorted(iorsites[siteorder], iorsites)
+        sitecount = np.bincount(iorsites)[iorsites]
+        # jumps as arrays: initial (i,o) index, whether the initial dumbbell is at the origin cell,
+        # final (i,o) index, and translation of the dumbbell
+        jump_ior1 = np.array([j.state1.iorind for j in self.jumplist], dtype=int)
+        jump_origin = np.array([np.allclose(j.state1.R, 0) for j in self.jumplist], dtype=bool)
+        jump_ior2 = np.array([j.state2.iorind for j in self.jumplist], dtype=int)
+        jump_dR = np.array([j.state2.R - j.state1.R for j in self.jumplist], dtype=int).reshape(-1, dim)
         # Now build the next shells:
         for step in range(Nshells - 1):
             start = time.time()
-            nextshell = set([])
-            for j in self.jumplist:
-                for pair in lastshell:
-                    if not np.allclose(pair.R_s, 0, atol=self.crys.threshold):
-                        raise ValueError("The solute is not at the origin in a complex state")
-                    try:
-                        pairnew = pair.addjump(j)
-                    except ArithmeticError:
-                        # If there is somehow a type error, we will get the message.
-                        continue
-                    if not (pair.i_s == pairnew.i_s and np.allclose(pairnew.R_s, pair.R_s, atol=self.crys.threshold)):
-                        raise ArithmeticError("Solute shifted by a complex jump!(?)")
-                    # Now, when we find a new dumbbell location, we have to consider all possible orientations in that location.
-                    # Let's get the dumbbell location
-                    site_db, Rdb = self.pdbcontainer.iorlist[pairnew.db.iorind][0], pairnew.db.R.copy()
-                    for idx, (site_db2, o) in enumerate(self.pdbcontainer.iorlist):
-                        if site_db2 == site_db:  # make sure we are making dumbbells at the correct site
-                            dbstateNew = dumbbell(idx, Rdb)
-                            pairnew = SdPair(pair.i_s, pair.R_s, dbstateNew)
-                            nextshell.add(pairnew)
-                            stateset.add(pairnew)
-
-            lastshell = nextshell.copy()
+            # every (pair, jump) where the jump starts from the dumbbell of the pair (as in SdPair.addjump)
+            a, b = np.nonzero(lastshell[:, 1, np.newaxis] == jump_ior1[np.newaxis, :])
+            if not np.all(jump_origin[b]):
+                raise ValueError("Initial dumbbell not at origin unit cell")
+            # Now, when we find a new dumbbell location, we have to consider all possible orientations in that location.
+            counts = sitecount[jump_ior2[b]]
+            offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            iornew = siteorder[np.repeat(sitestart[jump_ior2[b]], counts) + offsets]
+            rows = np.column_stack((np.repeat(lastshell[a, 0], counts), iornew,
+                                    np.repeat(lastshell[a, 2:] + jump_dR[b], counts, axis=0)))
+            lastshell = np.unique(rows.reshape(-1, 2 + dim), axis=0)
+            shells.append(lastshell)
             print("built shell {}: time - {}".format(step+2, time.time()-start))
+        if Nshells > 1:
+            allstates = np.unique(np.concatenate(shells), axis=0)
+            stateset = set(SdPair(i_s, z.copy(), dumbbell(iorind, R))
+                           for (i_s, iorind), R in zip(allstates[:, :2].tolist(), allstates[:, 2:]))
 
         self.stateset = stateset
         # group the states by symmetry - form the stars
-        self.complexStates = sorted(list(self.stateset), key=self._sortkey)
+        statelist = list(self.stateset)
+        self.complexStates = [statelist[n] for n in np.argsort(self._sortkeys(statelist), kind='stable').tolist()]
         self.bareStates = [dumbbell(idx, z) for idx in range(len(self.pdbcontainer.iorlist))]
         stars = []
         self.complexIndexdict = {}
         starindexed=[]
         allset = set([])
         start = time.time()
-        for state in self.stateset:
+        pdbcontainer, G = self.pdbcontainer, self.pdbcontainer.G
+        # index of each state in complexStates, to avoid searching the list
+        complexStateindex = {state: ind for ind, state in enumerate(self.complexStates)}
+        for state in stateset:
             if state in allset:  # see if already considered before.
                 continue
             newstar = []
             newstar_index = []
-            for gdumb in self.pdbcontainer.G:
-                newstate = state.gop(self.pdbcontainer, gdumb)[0]
+            for gdumb in G:
+                newstate = state.gop(pdbcontainer, gdumb)[0]
                 newstate = newstate - newstate.R_s  # Shift the solute back to the origin unit cell.
-                if newstate in self.stateset:  # Check if this state is allowed to be present.
+                if newstate in stateset:  # Check if this state is allowed to be present.
                     if not newstate in allset:  # Check if this state has already been considered.
                         try:
-                            newstateind = self.complexStates.index(newstate)
-                        except:
+                            newstateind = complexStateindex[newstate]
+                        except KeyError:
                             raise KeyError("Something wrong in finding index for newstate")
                         newstar.append(newstate)
                         newstar_index.append(newstateind)
@@ -1335,7 +1790,7 @@ class DBStarSet(object):
 
         for starind, star in enumerate(self.stars):
             for state in star:
-                self.complexIndexdict[state] = (self.complexStates.index(state), starind)
+                self.complexIndexdict[state] = (complexStateindex[state], starind)
 
         # Keep the indices of the origin states. May be necessary when dealing with their rates and probabilities
         # self.originstates = []
@@ -1444,15 +1899,11 @@ class DBStarSet(object):
         Note that this is called before mixed dumbbell stars are added in. The mixed dumbbells being in a periodic state
         space, all the mixed dumbbell states are at the origin anyway.
         """
-        inddict = {}
-        for i, star in enumerate(self.stars):
-            inddict[i] = self._sortkey(star[0])
-        # Now sort the stars according to dx^2, i.e, sort the dictionary by value
-        sortlist = sorted(inddict.items(), key=lambda x: x[1])
-        # print(sortlist)
+        # sort the stars according to dx^2 of their first state
+        sortlist = np.argsort(self._sortkeys([star[0] for star in self.stars]), kind='stable').tolist()
         starnew = []
         starIndexnew = []
-        for (ind, dx2) in sortlist:
+        for ind in sortlist:
             starnew.append(self.stars[ind])
             starIndexnew.append(self.starindexed[ind])
 
@@ -1511,7 +1962,7 @@ class DBStarSet(object):
                                 jumpset.add(-jnew)
 
                         # remove redundant rotations.
-                        if np.allclose(DB_disp(self.pdbcontainer, newlist[0].state1, newlist[0].state2), np.zeros(self.crys.dim),
+                        if np.allclose(DB_disp(self.pdbcontainer, newlist[0].state1, newlist[0].state2), 0,
                                        atol=self.pdbcontainer.crys.threshold)\
                                 and newlist[0].state1.i_s == newlist[0].state2.i_s:
                             for jind in range(len(newlist)-1, -1, -1):
@@ -1519,7 +1970,7 @@ class DBStarSet(object):
                                 j = newlist[jind]
                                 j_equiv = jump(j.state1, j.state2, -j.c1, -j.c2)
                                 if j_equiv in jumpset:
-                                    newlist.remove(j)
+                                    del newlist[jind]
                                     # keep the equivalent, discard the original.
                                     jumpset.remove(j)
                                     # Also discard the original from the jumpset, or the equivalent will be
@@ -1574,6 +2025,9 @@ class DBStarSet(object):
         alljumpset_omega43_all = set([])
         start = time.time()
         print("building omega43")
+        # dumbbell group operations corresponding to each crystal group operation (last match, as G_crys may repeat)
+        gdumb_pure_crys = {gval: gdumb for gdumb, gval in self.pdbcontainer.G_crys.items()}
+        gdumb_mixed_crys = {gval: gdumb for gdumb, gval in self.mdbcontainer.G_crys.items()}
         for p_pure in self.complexStates:
             if p_pure.is_zero(self.pdbcontainer):  # Spectator rotating into mixed dumbbell does not make sense.
                 continue
@@ -1602,13 +2056,8 @@ class DBStarSet(object):
                             newneglist = []
                             newalllist = []
                             for g in self.crys.G:
-                                for pgdumb, gval in self.pdbcontainer.G_crys.items():
-                                    if gval == g:
-                                        gdumb_pure = pgdumb
-
-                                for mgdumb, gval in self.mdbcontainer.G_crys.items():
-                                    if gval == g:
-                                        gdumb_mixed = mgdumb
+                                gdumb_pure = gdumb_pure_crys[g]
+                                gdumb_mixed = gdumb_mixed_crys[g]
 
                                 # Assert consistency
                                 if not (np.allclose(gdumb_pure.cartrot, gdumb_mixed.cartrot) and
@@ -1711,8 +2160,10 @@ class DBVectorStars(object):
         # vecpos: list of "positions" (state indices) for each vector star (list of lists)
         # vecvec: list of vectors for each vector star (list of lists of vectors)
         # Nvstars: number of vector stars
+        # starsetstars: stars of starset when we were generated (replaced whenever they change)
 
         self.starset = None
+        self.starsetstars = None
         self.Nvstars = 0
         if starset is not None:
             if starset.Nshells > 0:
@@ -1723,24 +2174,30 @@ class DBVectorStars(object):
         Follows almost the same as that for solute-vacancy case. Only generalized to keep the state
         under consideration unchanged.
         """
-        self.starset = None
-        if starset.Nshells == 0: return
-        if starset == self.starset: return
+        if starset.Nshells == 0:
+            self.starset = None
+            return
+        if starset is self.starset and starset.stars is self.starsetstars: return
         self.starset = starset
+        self.starsetstars = starset.stars
         self.crys = self.starset.crys
         self.vecpos = []
         self.vecpos_indexed = []
         self.vecvec = []
         self.Nvstars_spec = 0
+        pdbG, mdbG = starset.pdbcontainer.G, starset.mdbcontainer.G
         # first do it for the complexes
         for star, indstar in zip(starset.stars[:starset.mixedstartindex],
                                  starset.starindexed[:starset.mixedstartindex]):
             pair0 = star[0]
             glist = []
+            # cartesian rotation of the first group operation that takes pair0 into each state
+            gcartrot = {}
             # Find group operations that leave state unchanged
-            for gdumb in starset.pdbcontainer.G:
+            for gdumb in pdbG:
                 pairnew = pair0.gop(starset.pdbcontainer, gdumb)[0]
                 pairnew = pairnew - pairnew.R_s
+                gcartrot.setdefault(pairnew, gdumb.cartrot)
                 if pairnew == pair0:
                     glist.append(starset.pdbcontainer.G_crys[gdumb])  # Although appending gdumb itself also works
             # Find the intersected vector basis for these group operations
@@ -1753,23 +2210,14 @@ class DBVectorStars(object):
             if Nvect > 0:
                 if pair0.is_zero(self.starset.pdbcontainer):
                     self.Nvstars_spec += Nvect
+                # The vectors associated with a state are translationally invariant (the solute is
+                # translated back to the origin above), so only the rotational part of the group op
+                # that takes pair0 into each state acts on the vector.
+                rotlist = np.array([gcartrot[pairI] for pairI in star])
                 for v in vlist:
                     self.vecpos.append(star)
                     self.vecpos_indexed.append(indstar)
-                    # implement a copy function like in case of vacancies
-                    veclist = []
-                    for pairI in star:
-                        for gdumb in starset.pdbcontainer.G:
-                            pairnew = pair0.gop(starset.pdbcontainer, gdumb)[0]
-                            pairnew = pairnew - pairnew.R_s  # translate solute back to origin
-                            # This is because the vectors associated with a state are translationally invariant.
-                            # Wherever the solute is, if the relative position of the solute and the solvent is the
-                            # same, the vector remains unchanged due to that group op.
-                            # Remember that only the rotational part of the group op will act on the vector.
-                            if pairnew == pairI:
-                                veclist.append(starset.crys.g_direc(starset.pdbcontainer.G_crys[gdumb], v))
-                                break
-                    self.vecvec.append(veclist)
+                    self.vecvec.append(list(np.dot(rotlist, v)))
 
         self.Nvstars_pure = len(self.vecpos)
 
@@ -1778,10 +2226,12 @@ class DBVectorStars(object):
                                  starset.starindexed[starset.mixedstartindex:]):
             pair0 = star[0]
             glist = []
+            gcartrot = {}
             # Find group operations that leave state unchanged
-            for gdumb in starset.mdbcontainer.G:
+            for gdumb in mdbG:
                 pairnew = pair0.gop(starset.mdbcontainer, gdumb, complex=False)
                 pairnew = pairnew - pairnew.R_s  # again, only the rotation part matters.
+                gcartrot.setdefault(pairnew, gdumb.cartrot)
                 # what about dumbbell rotations? Does not matter - the state has to remain unchanged
                 # Is this valid for origin states too? verify - because we have origin states.
                 if pairnew == pair0:
@@ -1795,18 +2245,11 @@ class DBVectorStars(object):
             Nvect = len(vlist)
             if Nvect > 0:  # why did I put this? Makes sense to expand only if Nvects >0, otherwise there is zero bias.
                 # verify this
+                rotlist = np.array([gcartrot[pairI] for pairI in star])
                 for v in vlist:
                     self.vecpos.append(star)
                     self.vecpos_indexed.append(indstar)
-                    veclist = []
-                    for pairI in star:
-                        for gdumb in starset.mdbcontainer.G:
-                            pairnew = pair0.gop(starset.mdbcontainer, gdumb, complex=False)
-                            pairnew = pairnew - pairnew.R_s  # translate solute back to origin
-                            if pairnew == pairI:
-                                veclist.append(starset.crys.g_direc(starset.mdbcontainer.G_crys[gdumb], v))
-                                break
-                    self.vecvec.append(veclist)
+                    self.vecvec.append(list(np.dot(rotlist, v)))
 
         self.Nvstars = len(self.vecpos)
 
@@ -1816,9 +2259,11 @@ class DBVectorStars(object):
         for star in starset.barePeriodicStars:
             db0 = star[0]
             glist = []
-            for gdumb in starset.pdbcontainer.G:
+            gcartrot = {}
+            for gdumb in pdbG:
                 dbnew = db0.gop(starset.pdbcontainer, gdumb)[0]
                 dbnew = dbnew - dbnew.R  # cancel out the translation
+                gcartrot.setdefault(dbnew, gdumb.cartrot)
                 if dbnew == db0:
                     glist.append(starset.pdbcontainer.G_crys[gdumb])
             vb = reduce(crystal.CombineVectorBasis, [crystal.VectorBasis(*g.eigen()) for g in glist])
@@ -1828,17 +2273,10 @@ class DBVectorStars(object):
             vlist = [v * scale for v in vlist]
             Nvect = len(vlist)
             if Nvect > 0:
+                rotlist = np.array([gcartrot[st] for st in star])
                 for v in vlist:
-                    veclist = []
                     self.vecpos_bare.append(star)
-                    for st in star:
-                        for gdumb in starset.pdbcontainer.G:
-                            dbnew, flip = db0.gop(starset.pdbcontainer, gdumb)
-                            dbnew = dbnew - dbnew.R
-                            if dbnew == st:
-                                veclist.append(starset.crys.g_direc(starset.pdbcontainer.G_crys[gdumb], v))
-                                break
-                    self.vecvec_bare.append(veclist)
+                    self.vecvec_bare.append(list(np.dot(rotlist, v)))
 
         self.stateToVecStar_pure = defaultdict(list)
         for IndofStar, crStar in enumerate(self.vecpos[:self.Nvstars_pure]):
@@ -1976,9 +2414,8 @@ class DBVectorStars(object):
         print("Built Complex GF expansions: {}".format(time.time() - start))
 
         # symmetrize
-        for i in range(Nvstars_pure):
-            for j in range(0, i):
-                GFexpansion_pure[i, j, :] = GFexpansion_pure[j, i, :]
+        lower = np.tril_indices(Nvstars_pure, k=-1)
+        GFexpansion_pure[lower] = GFexpansion_pure[lower[::-1]]
 
         return (GFstarset_pure, GFPureStarInd, zeroclean(GFexpansion_pure))
 
@@ -580,11 +580,11 @@ class Supercell(object):
             for ind, gind in enumerate(indexmap):
                 gocc[gind] = self.occ[ind]
             if np.any(gocc != other.occ): continue
-            # 5. we have a winner. Now it's all up to getting the mapping; done with index()
-            gorder = [[indexmap[ind] for ind in clist] for clist in self.chemorder]
+            # 5. we have a winner. Now it's all up to getting the mapping; done with an inverse index
+            gorder = [{indexmap[ind]: n for n, ind in enumerate(clist)} for clist in self.chemorder]
             mapping = []
-            for gclist, otherlist in zip(gorder, other.chemorder):
-                mapping.append([gclist.index(index) for index in otherlist])
+            for gclistindex, otherlist in zip(gorder, other.chemorder):
+                mapping.append([gclistindex[index] for index in otherlist])
             break
 
         if mapping is None: return None, mapping
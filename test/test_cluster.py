@@ -462,6 +462,24 @@ class MonteCarloTests(unittest.TestCase):
             self.MC.transitions()
         self.assertIsInstance(self.MCjn, cluster.MonteCarloSampler)
 
+    def testMortonOrder(self):
+        """Are the energy interactions ordered along a Morton curve?"""
+        self.assertEqual(cluster.morton_encode_3d(1, 0, 0), 1)
+        self.assertEqual(cluster.morton_encode_3d(0, 1, 0), 2)
+        self.assertEqual(cluster.morton_encode_3d(0, 0, 1), 4)
+        self.assertEqual(cluster.morton_encode_3d(3, 3, 3), 63)
+        for MCsampler in (self.MC, self.MCjn):
+            for interact, Ninteract in zip(MCsampler.siteinteract, MCsampler.Ninteract):
+                self.assertTrue(np.all(np.diff(interact[:Ninteract]) > 0))
+            firstsite = {}
+            for i, (interact, Ninteract) in enumerate(zip(MCsampler.siteinteract, MCsampler.Ninteract)):
+                for m in interact[:Ninteract]:
+                    if m < MCsampler.Nenergy and m not in firstsite:
+                        firstsite[m] = i
+            keys = [cluster.morton_encode_3d(*self.sup.translist[firstsite[m] // self.sup.Nmobile])
+                    for m in sorted(firstsite)]
+            self.assertTrue(np.all(np.diff(np.array(keys, dtype=float)) >= 0))
+
     def testStart(self):
         """Does start() perform as expected?"""
         for MCsampler in (self.MC, self.MCjn):
@@ -648,6 +666,42 @@ class MonteCarloTests(unittest.TestCase):
             MCjn2_jit.MCmoves(occchoices[n:n+1], unoccchoices[n:n+1], kTlogu[n:n+1])
             self.assertTrue(np.allclose(MCjn_jit.occ, MCjn2_jit.occ))
 
+    def testSampler_Sweep_jit(self):
+        """Does our jit sampler run MC sweeps with its internal random number generator?"""
+        occ = np.random.choice((0,1), size=self.sup.size)
+        if self.vacancy >= 0:
+            occ[self.vacancy] = -1
+        self.MCjn.start(occ)
+        MCjn_jit = cluster.MonteCarloSampler_jit(**cluster.MonteCarloSampler_param(self.MCjn, seed=1))
+        MCjn2_jit = MCjn_jit.copy()
+        u = np.array([MCjn_jit.random() for n in range(1024)])
+        self.assertTrue(np.all(u >= 0) and np.all(u < 1))
+        self.assertTrue(np.allclose(u, [MCjn2_jit.random() for n in range(1024)]))  # copies share a stream
+        MCjn4_jit = MCjn_jit.copy(True)  # ... unless jumped ahead
+        MCjn5_jit = MCjn_jit.copy()
+        MCjn5_jit.jump()
+        u4 = np.array([MCjn4_jit.random() for n in range(16)])
+        self.assertTrue(np.allclose(u4, [MCjn5_jit.random() for n in range(16)]))
+        self.assertFalse(np.allclose(u4, [MCjn2_jit.random() for n in range(16)]))
+        Nocc = MCjn_jit.Nocc
+        MCjn_jit.MCsweep(256, 1.)
+        self.assertEqual(Nocc, MCjn_jit.Nocc)
+        # compare to a sampler started from scratch with the new occupancies:
+        MCjn3_jit = MCjn_jit.copy()
+        MCjn3_jit.start(MCjn_jit.occ.copy())
+        self.assertTrue(np.all(MCjn_jit.clustercount == MCjn3_jit.clustercount))
+        self.assertAlmostEqual(MCjn_jit.E(), MCjn3_jit.E())
+        # a completely full or empty lattice has no moves, and should be left unchanged:
+        for fill in (0, 1):
+            occ = np.full(self.sup.size, fill)
+            if self.vacancy >= 0:
+                occ[self.vacancy] = -1
+            MCjn_jit.start(occ)
+            clustercount = MCjn_jit.clustercount.copy()
+            MCjn_jit.MCsweep(16, 1.)
+            self.assertTrue(np.all(MCjn_jit.occ == occ))
+            self.assertTrue(np.all(MCjn_jit.clustercount == clustercount))
+
 
 class VacancyMonteCarloTests(MonteCarloTests):
     """Tests of the MonteCarloSampler class with a vacancy"""
@@ -659,11 +659,11 @@ class CrystalClassTests(unittest.TestCase):
             for ind in wyckset:
                 # construct our own Wyckoff set using cart2pos...
                 wyckset2 = crys.Wyckoffpos(crys.basis[ind[0]][ind[1]])
-                # test equality:
-                for i in wyckset:
-                    self.assertTrue(np.any([np.allclose(crys.basis[i[0]][i[1]], u) for u in wyckset2]))
-                for u in wyckset2:
-                    self.assertTrue(np.any([np.allclose(crys.basis[i[0]][i[1]], u) for i in wyckset]))
+                # test equality: match[a, b] is True if basis position a is wyckset2 position b
+                upos = np.array([crys.basis[i[0]][i[1]] for i in wyckset])
+                match = np.all(np.isclose(upos[:, np.newaxis, :], np.array(wyckset2)[np.newaxis, :, :]), axis=2)
+                self.assertTrue(np.all(np.any(match, axis=1)))
+                self.assertTrue(np.all(np.any(match, axis=0)))
 
     def testVectorBasis(self):
         """Test for the generation of a vector (and tensor) basis for sites in a crystal: oct. + tet."""
@@ -964,7 +964,7 @@ class KPTgentest(unittest.TestCase):
             if all([np.dot(k, G) < (np.dot(G, G) - 1e-8) for G in self.crys.BZG]):
                 basewt = 1. / Nkpt
                 sortk = sorted(k)
-                basewt *= (2 ** (3 - list(k).count(0)))
+                basewt *= 1 << (3 - int(np.sum(k == 0)))
                 if sortk[0] != sortk[1] and sortk[1] != sortk[2]:
                     basewt *= 6
                 elif sortk[0] != sortk[1] or sortk[1] != sortk[2]:
@@ -8,12 +8,29 @@ __author__ = 'Dallas R. Trinkle'
 #
 
 import unittest
+import functools
 import onsager.crystal as crystal
 import numpy as np
 import onsager.crystalStars as stars
 
 
+def cachedsetup(setup):
+    """
+    Build each crystal and jumpnetwork once for the module: the crystal is shared (which also lets
+    StarSet reuse its generate() cache across tests), while each call gets a copy of the jumpnetwork.
+    """
+    cached = functools.lru_cache(maxsize=None)(setup)
+
+    @functools.wraps(setup)
+    def copysetup():
+        crys, jumpnetwork = cached()
+        return crys, [[(ij, dx.copy()) for ij, dx in jumplist] for jumplist in jumpnetwork]
+
+    return copysetup
+
+
 # Setup for orthorhombic, simple cubic, and FCC cells:
+@cachedsetup
 def setuportho():
     crys = crystal.Crystal(np.array([[3, 0, 0], [0, 2, 0], [0, 0, 1]], dtype=float),
                            [[np.zeros(3)]])
@@ -27,6 +44,7 @@ def orthorates():
     return np.array([3., 2., 1.])
 
 
+@cachedsetup
 def setupcubic():
     crys = crystal.Crystal(np.eye(3), [[np.zeros(3)]])
     jumpnetwork = [[((0, 0), np.array([1., 0., 0.])), ((0, 0), np.array([-1., 0., 0.])),
@@ -34,6 +52,7 @@ def setupcubic():
                     ((0, 0), np.array([0., 0., 1.])), ((0, 0), np.array([0., 0., -1.]))]]
     return crys, jumpnetwork
 
+@cachedsetup
 def setupsquare():
     crys = crystal.Crystal(np.eye(2), [[np.zeros(2)]])
     jumpnetwork = [[((0, 0), np.array([1., 0.])), ((0, 0), np.array([-1., 0.])),
@@ -49,6 +68,7 @@ def squarerates():
     return np.array([1. / 4.])
 
 
+@cachedsetup
 def setupFCC():
     lattice = crystal.Crystal.FCC(2.)
     jumpnetwork = lattice.jumpnetwork(0, 2. * np.sqrt(0.5) + 0.01)
@@ -59,6 +79,7 @@ def FCCrates():
     return np.array([1. / 12.])
 
 
+@cachedsetup
 def setupHCP():
     lattice = crystal.Crystal.HCP(1.)
     jumpnetwork = lattice.jumpnetwork(0, 1.01)
@@ -69,6 +90,7 @@ def HCPrates():
     return np.array([1. / 12., 1. / 12.])
 
 
+@cachedsetup
 def setupBCC():
     lattice = crystal.Crystal.BCC(1.)
     jumpnetwork = lattice.jumpnetwork(0, np.sqrt(0.75) + 0.01)
@@ -79,6 +101,7 @@ def BCCrates():
     return np.array([1. / 8.])
 
 
+@cachedsetup
 def setupB2():
     lattice = crystal.Crystal(np.eye(3), [np.array([0., 0., 0.]), np.array([0.45, 0.45, 0.45])])
     jumpnetwork = lattice.jumpnetwork(0, 0.9)
@@ -126,6 +149,70 @@ class PairStateTests(unittest.TestCase):
         self.assertTrue(zero.iszero())
         self.assertTrue(stars.PairState.fromcrys(self.hcp, 0, (0, 0), np.zeros(3)).iszero())
 
+    def testHash(self):
+        """Is the (cached) hash consistent with equality?"""
+        pos1 = self.hcp.pos2cart(np.array([0, 0, 0]), (0, 0))  # first site
+        pos2a1 = self.hcp.pos2cart(np.array([1, 0, 0]), (0, 1))  # second + a1
+        ps1 = stars.PairState.fromcrys(self.hcp, 0, (0, 1), pos2a1 - pos1)
+        ps2 = stars.PairState.fromcrys_latt(self.hcp, 0, (0, 1), ps1.R.copy())
+        self.assertEqual(ps1, ps2)
+        self.assertEqual(hash(ps1), hash(ps2))
+        self.assertEqual(hash(ps1), hash(ps1._replace(dx=-ps1.dx)))
+        self.assertEqual(len({ps1, ps2, -(-ps1)}), 1)
+
+    def testPack(self):
+        """Are packed keys unique, and consistent between single states and arrays?"""
+        PSlist = [stars.PairState.fromcrys_latt(self.hcp, 0, (i, j), np.array(R))
+                  for i in range(2) for j in range(2)
+                  for R in [(0, 0, 0), (1, 0, 0), (-1, 0, 0), (0, -1, 2), (2047, -2048, 5)]]
+        keys = stars.packstates(*stars.PSlist2array(PSlist)[:2])
+        self.assertEqual(len(set(keys.tolist())), len(PSlist))
+        for PS, key in zip(PSlist, keys):
+            self.assertEqual(stars.packstate(PS), key)
+        self.assertIsNone(stars.packstate(stars.PairState.fromcrys_latt(self.hcp, 0, (0, 0),
+                                                                         np.array([2048, 0, 0]))))
+        self.assertIsNone(stars.packstate(stars.PairState(i=4096, j=0, R=np.zeros(3, dtype=int), dx=np.zeros(3))))
+        for ij, R in ((np.array([[0, 0]]), np.array([[2048, 0, 0]])),
+                      (np.array([[4096, 0]]), np.zeros((1, 3), dtype=int)),
+                      (np.array([[0, -1]]), np.zeros((1, 3), dtype=int))):
+            self.assertFalse(stars.packable(ij, R)[0])
+            with self.assertRaises(ValueError):
+                stars.packstates(ij, R)
+
+    def testCompose(self):
+        """Does the array composition of states match PairState addition?"""
+        jumpnetwork = self.hcp.jumpnetwork(0, 1.01)
+        PSlist = [stars.PairState.fromcrys(self.hcp, 0, ij, dx) for jlist in jumpnetwork for ij, dx in jlist]
+        PSsums = []
+        for ps1 in PSlist:
+            for ps2 in PSlist:
+                try:
+                    PSsums.append(ps1 + ps2)
+                except ArithmeticError:
+                    pass
+        ij, R, dx = stars.composestates(*(stars.PSlist2array(PSlist) + stars.PSlist2array(PSlist)))
+        PScompose = stars.array2PSlist(ij, R, dx)
+        self.assertEqual(PSsums, PScompose)
+        for ps0, ps1 in zip(PSsums, PScompose):
+            self.assertTrue(np.allclose(ps0.dx, ps1.dx))
+        self.assertEqual([ps.iszero() for ps in PScompose], stars.zerostates(ij, R).tolist())
+
+    def testSortStates(self):
+        """Does sortstates order by magnitude, with arrays to match?"""
+        jumpnetwork = self.hcp.jumpnetwork(0, 1.01)
+        PSlist = [stars.PairState.fromcrys(self.hcp, 0, ij, dx) for jlist in jumpnetwork for ij, dx in jlist]
+        PSlist = [ps1 + ps2 for ps1 in PSlist for ps2 in PSlist if ps1.j == ps2.i]
+        PSsorted, ij, R, dx = stars.sortstates(PSlist)
+        x2 = [stars.PairState.sortkey(PS) for PS in PSsorted]
+        self.assertTrue(np.all(np.diff(x2) > -1e-8))  # sorted, to within threshold
+        self.assertEqual(x2, [stars.PairState.sortkey(PS) for PS in PSsorted])  # cached
+        self.assertEqual(PSsorted, stars.sortstates(PSlist[::-1])[0])  # independent of input order
+        self.assertTrue(np.allclose(x2, np.sum(dx**2, axis=1)))
+        self.assertEqual(PSsorted, stars.array2PSlist(ij, R, dx))
+        PSsorted, ij, R, dx = stars.sortstates([], dim=2)
+        self.assertEqual(PSsorted, [])
+        self.assertEqual((ij.shape, R.shape, dx.shape), ((0, 2), (0, 2), (0, 2)))
+
     def testArithmetic(self):
         """Does addition,subtraction, and endpoint subtraction work as expected?"""
         pos1 = self.hcp.pos2cart(np.array([0, 0, 0]), (0, 0))  # first site
@@ -140,6 +227,7 @@ class PairStateTests(unittest.TestCase):
         ps2 = stars.PairState.fromcrys(self.hcp, 0, (1, 0), pos1 - pos2)
         with self.assertRaises(ArithmeticError):
             ps1 + ps2
+        self.assertIsNone(ps1.tryadd(ps2))
         ps3 = stars.PairState.fromcrys(self.hcp, 0, (1, 0), pos1a1 - pos2)
         self.assertEqual(ps2 + ps1, ps3)
         ps4 = stars.PairState.fromcrys(self.hcp, 0, (0, 1), pos2a1 - pos1)
@@ -154,6 +242,8 @@ class PairStateTests(unittest.TestCase):
         self.assertEqual(ps1 ^ ps2, ps3)
         with self.assertRaises(ArithmeticError):
             ps1 ^ ps3
+        self.assertIsNone(ps1.tryxor(ps3))
+        self.assertEqual(ps1.tryxor(ps2), ps3)
         self.assertEqual(stars.PairState.fromcrys(self.hcp, 0, (1, 0), pos1 - pos2),
                          - stars.PairState.fromcrys(self.hcp, 0, (0, 1), pos2 - pos1))
 
@@ -199,20 +289,28 @@ class StarTests(unittest.TestCase):
 
     def isclosed(self, starset, starindex):
         """Evaluate if star s is closed against group operations."""
-        for i1 in starset.stars[starindex]:
-            ps1 = starset.states[i1]
-            for i2 in starset.stars[starindex]:
-                ps2 = starset.states[i2]
-                if not any(ps1 == ps2.g(self.crys, self.chem, g) for g in self.crys.G):
-                    return False
-        return True
+        # as G is a group, every pair in the star is related by some g iff every state is in the orbit
+        # of the first one:
+        starstates = [starset.states[i] for i in starset.stars[starindex]]
+        ps0 = starstates[0]
+        gps0set = {ps0.g(self.crys, self.chem, g) for g in self.crys.G}
+        return all(ps in gps0set for ps in starstates)
+
+    def assertClosedStars(self, starset, verified):
+        """Assert every star is closed, skipping (and adding to) the set of verified stars."""
+        for starindex, star in enumerate(starset.stars):
+            starstates = frozenset(starset.states[i] for i in star)
+            if starstates in verified: continue
+            self.assertTrue(self.isclosed(starset, starindex))
+            verified.add(starstates)
 
     def testStarConsistent(self):
         """Check that the counts (Npts, Nstars) make sense, with Nshells = 1..4"""
+        verified = set()  # stars (as sets of states) already found closed with fewer shells
         for n in range(1, 5):
-            self.starset.generate(n)
-            for starindex in range(self.starset.Nstars):
-                self.assertTrue(self.isclosed(self.starset, starindex))
+            with self.subTest(Nshells=n):
+                self.starset.generate(n)
+                self.assertClosedStars(self.starset, verified)
 
     def testStarindices(self):
         """Check that our indexing is correct."""
@@ -224,6 +322,97 @@ class StarTests(unittest.TestCase):
         self.assertEqual(None, self.starset.starindex(stars.PairState.zero(dim=dim)))
         self.assertEqual(None, self.starset.stateindex(stars.PairState.zero(dim=dim)))
         self.assertNotIn(stars.PairState.zero(dim=dim), self.starset)  # test __contains__ (PS in starset)
+        PSlist = self.starset.states + [stars.PairState.zero(dim=dim)]
+        indices = self.starset.stateindices(*stars.PSlist2array(PSlist)[:2])
+        self.assertEqual(indices.tolist(), list(range(self.starset.Nstates)) + [-1])
+
+    def testOrbit(self):
+        """Does orbit() match applying each group operation in turn?"""
+        self.starset.generate(2)
+        for PS in self.starset.states:
+            gPSlist = self.starset.orbit(PS)
+            self.assertEqual(len(gPSlist), len(self.crys.G))
+            for g, gPS in zip(self.crys.G, gPSlist):
+                gPSdirect = PS.g(self.crys, self.chem, g)
+                self.assertEqual(gPS, gPSdirect)
+                self.assertTrue(np.allclose(gPS.dx, gPSdirect.dx))
+
+    def testCanonicalKeys(self):
+        """Do canonical keys match if and only if states are in the same star?"""
+        self.starset.generate(3)
+        keys = self.starset.canonicalkeys(self.starset.states_ij, self.starset.states_R)
+        for si, star in enumerate(self.starset.stars):
+            self.assertEqual(len(set(keys[star])), 1)
+            self.assertEqual(np.sum(keys == keys[star[0]]), len(star))
+        self.assertEqual(stars.groupstars(keys), self.starset.stars)
+
+    def testSymmatch(self):
+        """Does symmatch identify states in the same star, and only those?"""
+        self.starset.generate(2)
+        for si, star in enumerate(self.starset.stars):
+            PS = self.starset.states[star[0]]
+            for PS1 in self.starset.states:
+                self.assertEqual(self.starset.symmatch(PS1, PS), self.starset.starindex(PS1) == si)
+
+    def testGrowArray(self):
+        """Does growarray extend an array, reusing its storage when it can?"""
+        a = np.arange(3)
+        b = stars.growarray(a, 5)
+        self.assertEqual(b.tolist(), [0, 1, 2, 0, 0])
+        b[3:] = 7
+        c = stars.growarray(b, 6)
+        self.assertEqual(c.tolist(), [0, 1, 2, 7, 7, 0])
+        self.assertIs(c.base, b.base)
+        self.assertEqual(a.tolist(), [0, 1, 2])
+
+    def testGroupMap(self):
+        """Does the group map match applying each group operation to each state?"""
+        self.starset.generate(2)
+        Gmap = self.starset.groupmap()
+        self.assertEqual(Gmap.shape, (len(self.crys.G), self.starset.Nstates))
+        for xi, PS in enumerate(self.starset.states):
+            for gi, g in enumerate(self.crys.G):
+                self.assertEqual(self.starset.states[Gmap[gi, xi]], PS.g(self.crys, self.chem, g))
+
+    def testNegMap(self):
+        """Does the negation map index the negation of each state?"""
+        self.starset.generate(2)
+        negmap = self.starset.negmap()
+        self.assertEqual(negmap.shape, (self.starset.Nstates,))
+        for xi, PS in enumerate(self.starset.states):
+            self.assertEqual(self.starset.states[negmap[xi]], -PS)
+
+    def testGenerateCache(self):
+        """Does regenerating a StarSet reuse the cached states, without sharing them?"""
+        self.starset.generate(2)
+        starset2 = stars.StarSet(self.jumpnetwork, self.crys, self.chem, 2)
+        self.assertEqual(self.starset.states, starset2.states)
+        self.assertEqual(self.starset.stars, starset2.stars)
+        self.assertTrue(np.all(self.starset.index == starset2.index))
+        self.assertIsNot(self.starset.stars, starset2.stars)
+        starset2 += self.starset
+        starset3 = stars.StarSet(self.jumpnetwork, self.crys, self.chem, 2)
+        self.assertEqual(self.starset.states, starset3.states)
+        self.assertEqual(self.starset.stars, starset3.stars)
+
+    def testGenerateShells(self):
+        """Does growing the shells from an earlier generate() match generating them from scratch?"""
+        for n in range(1, 4):
+            self.starset.generate(n)
+        stars.StarSet.generatecache.pop(self.crys, None)
+        starset2 = stars.StarSet(self.jumpnetwork, self.crys, self.chem, 3)
+        self.assertEqualStars(self.starset, starset2)
+        self.starset.generate(2)
+        self.assertEqualStars(self.starset, stars.StarSet(self.jumpnetwork, self.crys, self.chem, 2))
+
+    def testGenerateOrder(self):
+        """Are the states and stars from generate() independent of the order of the jumps?"""
+        self.starset.generate(3)
+        jumpnetwork = [jlist[1:] + jlist[:1] for jlist in self.jumpnetwork[::-1]]
+        starset2 = stars.StarSet(jumpnetwork, self.crys, self.chem, 3)
+        self.assertEqual(self.starset.states, starset2.states)
+        self.assertEqual(self.starset.stars, starset2.stars)
+        self.assertTrue(np.array_equal(self.starset.states_dx, starset2.states_dx))
 
     def assertEqualStars(self, s1, s2):
         """Asserts that two star sets are equal."""
@@ -277,23 +466,23 @@ class CubicStarTests(StarTests):
     def testStarConsistent(self):
         """Check that the counts (Npts, Nstars) make sense for cubic, with Nshells = 1..4"""
         dim = self.crys.dim
+        verified = set()  # stars (as sets of states) already found closed with fewer shells
         for n in range(1, 5):
-            self.starset.generate(n)
-            for starindex in range(self.starset.Nstars):
-                self.assertTrue(self.isclosed(self.starset, starindex))
-            self.assertEqual(None, self.starset.starindex(stars.PairState.zero(dim=dim)))
-            self.assertEqual(None, self.starset.stateindex(stars.PairState.zero(dim=dim)))
-
-            for s in self.starset.stars:
-                x = np.sort(abs(self.starset.states[s[0]].dx))
-                num = (2 ** (3 - list(x).count(0)))
-                if not np.isclose(x[0], x[1]) and not np.isclose(x[1], x[2]):
-                    num *= 6
-                elif not np.isclose(x[0], x[1]) or not np.isclose(x[1], x[2]):
-                    num *= 3
-                self.assertEqual(num, len(s),
-                                 msg='Count for {} should be {}, got {}'.format(
-                                     self.starset.states[s[0]].dx, num, len(s)))
+            with self.subTest(Nshells=n):
+                self.starset.generate(n)
+                self.assertClosedStars(self.starset, verified)
+                self.assertEqual(None, self.starset.starindex(stars.PairState.zero(dim=dim)))
+                self.assertEqual(None, self.starset.stateindex(stars.PairState.zero(dim=dim)))
+
+                # expected count for each star from its representative: 2^(nonzero components) * permutations
+                dx0 = self.starset.states_dx[[s[0] for s in self.starset.stars]]
+                x = np.sort(abs(dx0), axis=1)
+                diff01, diff12 = ~np.isclose(x[:, 0], x[:, 1]), ~np.isclose(x[:, 1], x[:, 2])
+                num = (1 << (3 - np.sum(x == 0, axis=1))) * \
+                      np.where(diff01 & diff12, 6, np.where(diff01 | diff12, 3, 1))
+                lens = np.array([len(s) for s in self.starset.stars])
+                for dx, expected, got in zip(dx0[num != lens], num[num != lens], lens[num != lens]):
+                    self.fail('Count for {} should be {}, got {}'.format(dx, expected, got))
 
 
 class HCPStarTests(StarTests):
@@ -430,13 +619,13 @@ class VectorStarTests(unittest.TestCase):
         self.starset.generate(nshells)
         self.vecstarset = stars.VectorStarSet(self.starset)
         for s, vec in zip(self.vecstarset.vecpos, self.vecstarset.vecvec):
+            vecdict = dict(zip(s, vec))  # state index -> vector in this vector star
             for si, v in zip(s, vec):
                 PS = self.starset.states[si]
                 for g in self.crys.G:
                     gsi = self.starset.stateindex(PS.g(self.crys, self.chem, g))
-                    vrot = self.crys.g_direc(g, v)
-                    for si1, v1 in zip(s, vec):
-                        if gsi == si1: self.assertTrue(np.allclose(v1, vrot))
+                    if gsi in vecdict:
+                        self.assertTrue(np.allclose(vecdict[gsi], self.crys.g_direc(g, v)))
 
     def VectorStarOrthonormal(self, nshells):
         """Are the star vectors orthonormal?"""
@@ -1223,6 +1412,10 @@ class VectorStarBias1linearTests(unittest.TestCase):
             self.assertTrue(np.allclose(biasvec[i], biasveccomp[i]),
                             msg='Failure for state {}: {}\n{} != {}'.format(
                                 i, self.starset.states[i], biasvec[i], biasveccomp[i]))
+        # pruning the jumpnetwork in place (as VacancyMediated does) must show up in a new expansion
+        jumpnetwork_omega1.pop()
+        bias0prune, bias1prune = self.vecstarset.biasexpansions(jumpnetwork_omega1, jt[:-1])
+        self.assertTrue(np.allclose(bias1prune, bias1expand[:, :-1]))
 
     def testPeriodicBias(self):
         """Do we have no periodic bias?"""